@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+import logging
+import math
+import os
+import pickle
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class StudentFeatureState:
+    """Trailing attendance history for one student.
+
+    Keeps the last ``max(windows)`` attendance values in a ring buffer plus a
+    running sum and non-null count per window, so appending a record and
+    reading the averages are both O(1).
+    """
+
+    __slots__ = ('windows', 'buffer', 'head', 'n_records', 'sums', 'counts', 'last_date')
+
+    def __init__(self, windows: Tuple[int, ...]):
+        self.windows = windows
+        self.buffer = [math.nan] * max(windows)
+        self.head = 0
+        self.n_records = 0
+        self.sums = [0.0] * len(windows)
+        self.counts = [0] * len(windows)
+        self.last_date = None
+
+    def _leaving(self, window: int) -> float:
+        """Value that drops out of ``window`` when the next record is appended."""
+        if self.n_records < window:
+            return math.nan
+        return self.buffer[(self.head - window) % len(self.buffer)]
+
+    def peek(self, attended: float = math.nan) -> List[float]:
+        """Averages the next record would get, without recording it.
+
+        Args:
+            attended: Attendance flag of the pending record, NaN if unknown
+
+        Returns:
+            One average per window, NaN when the window holds no values
+        """
+        averages = []
+        present = not math.isnan(attended)
+        for i, window in enumerate(self.windows):
+            leaving = self._leaving(window)
+            total = self.sums[i] + (attended if present else 0.0)
+            count = self.counts[i] + present
+            if not math.isnan(leaving):
+                total -= leaving
+                count -= 1
+            averages.append(total / count if count else math.nan)
+        return averages
+
+    def update(self, attended: float, date: Optional[datetime] = None) -> List[float]:
+        """Append a record and return its averages.
+
+        Args:
+            attended: Attendance flag of the record, NaN if unknown
+            date: Record date; records must arrive in date order
+
+        Returns:
+            One average per window, including the new record
+        """
+        if date is not None:
+            if self.last_date is not None and date < self.last_date:
+                raise ValueError(f"Out-of-order record: {date} is before {self.last_date}")
+            self.last_date = date
+
+        averages = self.peek(attended)
+        present = not math.isnan(attended)
+        for i, window in enumerate(self.windows):
+            leaving = self._leaving(window)
+            if present:
+                self.sums[i] += attended
+                self.counts[i] += 1
+            if not math.isnan(leaving):
+                self.sums[i] -= leaving
+                self.counts[i] -= 1
+
+        self.buffer[self.head] = attended
+        self.head = (self.head + 1) % len(self.buffer)
+        self.n_records += 1
+        return averages
+
+class AttendanceFeatureStore:
+    """Online store of per-student rolling attendance features.
+
+    Produces the same ``attendance_<w>day_avg`` values as the batch
+    ``compute_rolling_attendance`` path for records replayed in date order,
+    so predictions only need today's raw fields instead of the full history.
+    """
+
+    def __init__(self, windows: Tuple[int, ...] = (7, 30)):
+        """Initialize an empty feature store.
+
+        Args:
+            windows: Window lengths, in records
+        """
+        self.windows = tuple(windows)
+        self.states: Dict = {}
+
+    @property
+    def feature_names(self) -> List[str]:
+        return [f'attendance_{window}day_avg' for window in self.windows]
+
+    def _state(self, student_id) -> StudentFeatureState:
+        state = self.states.get(student_id)
+        if state is None:
+            state = StudentFeatureState(self.windows)
+            self.states[student_id] = state
+        return state
+
+    def update(self, student_id, attended: float,
+               date: Optional[datetime] = None) -> Dict[str, float]:
+        """Record a new attendance event for a student.
+
+        Args:
+            student_id: Student identifier
+            attended: Attendance flag, NaN if unknown
+            date: Event date; events must arrive in date order per student
+
+        Returns:
+            Rolling features for the recorded event
+        """
+        averages = self._state(student_id).update(_as_float(attended), _as_datetime(date))
+        return dict(zip(self.feature_names, averages))
+
+    def features(self, student_id, attended: float = math.nan) -> Dict[str, float]:
+        """Rolling features for a student's next record, without recording it.
+
+        Args:
+            student_id: Student identifier
+            attended: Attendance flag of the pending record, NaN if unknown
+
+        Returns:
+            Rolling features the batch path would compute for that record
+        """
+        state = self.states.get(student_id)
+        if state is None:
+            state = StudentFeatureState(self.windows)
+        return dict(zip(self.feature_names, state.peek(_as_float(attended))))
+
+    def features_batch(self, student_ids: Iterable,
+                       attended: Optional[Iterable] = None) -> Dict[str, np.ndarray]:
+        """Rolling features for one pending record per student.
+
+        Each row is treated independently as that student's next record.
+
+        Returns:
+            Mapping of feature name to values aligned with ``student_ids``
+        """
+        student_ids = list(student_ids)
+        attended = [math.nan] * len(student_ids) if attended is None else list(attended)
+        rows = np.array(
+            [list(self.features(sid, value).values())
+             for sid, value in zip(student_ids, attended)],
+            dtype=np.float64
+        ).reshape(len(student_ids), len(self.windows))
+        return {name: rows[:, i] for i, name in enumerate(self.feature_names)}
+
+    @classmethod
+    def from_history(cls, data: pd.DataFrame,
+                     windows: Tuple[int, ...] = (7, 30)) -> 'AttendanceFeatureStore':
+        """Build a store by replaying the tail of an attendance history.
+
+        Args:
+            data: DataFrame with ``student_id``, ``date`` and ``attended``
+            windows: Window lengths, in records
+
+        Returns:
+            Populated feature store
+        """
+        store = cls(windows)
+        history = data[['student_id', 'date', 'attended']].copy()
+        history['date'] = pd.to_datetime(history['date'])
+        history = history.sort_values(['student_id', 'date'], kind='stable')
+
+        # Only the last max(windows) records per student affect the state
+        counts = history.groupby('student_id').size()
+        tail = history.groupby('student_id').tail(max(store.windows))
+
+        for student_id, group in tail.groupby('student_id', sort=False):
+            state = store._state(student_id)
+            for date, value in zip(group['date'], group['attended']):
+                state.update(_as_float(value), date.to_pydatetime())
+            # Account for records older than the buffer
+            state.n_records = int(counts[student_id])
+
+        logger.info(f"Feature store built for {len(store.states)} students")
+        return store
+
+    def save(self, path: str):
+        """Snapshot the store to disk atomically."""
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            snapshot = {
+                'windows': self.windows,
+                'states': {
+                    student_id: {slot: getattr(state, slot) for slot in StudentFeatureState.__slots__}
+                    for student_id, state in self.states.items()
+                }
+            }
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            logger.info(f"Feature store saved to {path}")
+        except Exception as e:
+            logger.error(f"Error saving feature store: {str(e)}")
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'AttendanceFeatureStore':
+        """Restore a store from a snapshot written by ``save``."""
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+            store = cls(snapshot['windows'])
+            for student_id, fields in snapshot['states'].items():
+                state = StudentFeatureState(store.windows)
+                for slot, value in fields.items():
+                    setattr(state, slot, value)
+                store.states[student_id] = state
+            logger.info(f"Feature store loaded from {path}")
+            return store
+        except Exception as e:
+            logger.error(f"Error loading feature store: {str(e)}")
+            raise
+
+def _as_float(value) -> float:
+    """Coerce an attendance flag to float, mapping missing values to NaN."""
+    if value is None:
+        return math.nan
+    return float(value)
+
+def _as_datetime(value) -> Optional[datetime]:
+    """Coerce a date-like value to datetime for ordering checks."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return pd.Timestamp(value).to_pydatetime()
@@ -0,0 +1,510 @@
+import numpy as np
+import cv2
+import logging
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make both the ai-engine modules and the ai/ services importable
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+AI_DIR = os.path.join(os.path.dirname(ENGINE_DIR), 'ai')
+sys.path.append(ENGINE_DIR)
+sys.path.append(AI_DIR)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BenchmarkConfig:
+    """Configuration for the benchmark suite."""
+    seed: int = 42
+    warmup: int = 3  # untimed calls before measuring
+    min_runs: int = 5
+    max_runs: int = 200
+    max_seconds: float = 20.0  # timing budget per case
+    image_size: Tuple[int, int] = (480, 640)  # (height, width) of synthetic frames
+    n_images: int = 32  # distinct synthetic frames cycled through
+    image_dir: Optional[str] = None  # face photos used instead of synthetic frames
+    gallery_sizes: Tuple[int, ...] = (1_000, 10_000, 100_000, 1_000_000)
+    embedding_dim: int = 128
+    faces_per_user: int = 5
+    api_gallery_size: int = 10_000  # enrolled faces behind the API cases
+    emotion_batch_size: int = 32
+    n_texts: int = 256  # texts per NLP batch
+    nlp_analysis_types: Tuple[str, ...] = ('sentiment', 'entities')
+    n_records: int = 10_000  # attendance rows per preprocess_data call
+    output_dir: str = os.path.join(ENGINE_DIR, 'reports', 'benchmarks')
+
+def synthetic_face_image(rng: np.random.Generator,
+                         size: Tuple[int, int] = (480, 640)) -> np.ndarray:
+    """BGR frame with a face-like figure on a smooth, textured background.
+    
+    The head, eyes, brows, nose and mouth vary in position, scale and skin
+    tone so detectors do real work instead of rejecting a noise image.
+    """
+    height, width = size
+    background = rng.integers(40, 200, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+    
+    # Head
+    cx = int(width * rng.uniform(0.35, 0.65))
+    cy = int(height * rng.uniform(0.4, 0.6))
+    face_w = int(min(height, width) * rng.uniform(0.15, 0.28))
+    face_h = int(face_w * 1.3)
+    skin = tuple(int(c) for c in rng.integers([60, 110, 150], [120, 170, 230]))
+    cv2.ellipse(image, (cx, cy), (face_w, face_h), 0, 0, 360, skin, -1)
+    
+    # Eyes and brows
+    for side in (-1, 1):
+        eye = (cx + side * face_w // 2, cy - face_h // 5)
+        cv2.ellipse(image, eye, (face_w // 5, face_h // 12), 0, 0, 360, (235, 235, 235), -1)
+        cv2.circle(image, eye, max(2, face_h // 16), (40, 30, 20), -1)
+        brow_y = eye[1] - face_h // 7
+        cv2.line(image, (eye[0] - face_w // 5, brow_y), (eye[0] + face_w // 5, brow_y),
+                 (30, 30, 40), max(2, face_h // 30))
+    
+    # Nose and mouth
+    cv2.line(image, (cx, cy - face_h // 10), (cx - face_w // 10, cy + face_h // 6),
+             tuple(int(c * 0.7) for c in skin), max(2, face_h // 40))
+    cv2.ellipse(image, (cx, cy + face_h // 2), (face_w // 3, face_h // 10), 0, 0, 180,
+                (60, 60, 160), max(2, face_h // 30))
+    
+    noise = rng.normal(0, 6, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+def load_images(config: BenchmarkConfig) -> List[np.ndarray]:
+    """Benchmark frames: photos from ``image_dir`` if set, else synthetic faces.
+    
+    Raises:
+        ValueError: If ``image_dir`` holds no readable images
+    """
+    if not config.image_dir:
+        rng = np.random.default_rng(config.seed)
+        return [synthetic_face_image(rng, config.image_size) for _ in range(config.n_images)]
+    
+    images = []
+    for name in sorted(os.listdir(config.image_dir)):
+        if os.path.splitext(name)[1].lower() in ('.jpg', '.jpeg', '.png', '.bmp'):
+            image = cv2.imread(os.path.join(config.image_dir, name), cv2.IMREAD_COLOR)
+            if image is not None:
+                images.append(image)
+        if len(images) == config.n_images:
+            break
+    if not images:
+        raise ValueError(f"No readable images in {config.image_dir}")
+    return images
+
+def face_detection_rate(images: List[np.ndarray]) -> float:
+    """Fraction of frames in which the MediaPipe detector finds a face."""
+    from preprocess.facePreprocess import FacePreprocessor
+    preprocessor = FacePreprocessor()
+    return sum(1 for image in images if preprocessor.detect_faces(image)) / len(images)
+
+def synthetic_gallery(n_faces: int, dim: int, faces_per_user: int,
+                      rng: np.random.Generator) -> Tuple[Dict, Dict]:
+    """Face database and L2-normalized embeddings in FaceRecognitionService format."""
+    embeddings = rng.standard_normal((n_faces, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    
+    database = {}
+    face_embeddings = {}
+    for i in range(n_faces):
+        user_id = f"user{i // faces_per_user}"
+        face_id = f"{user_id}_{i % faces_per_user}"
+        if user_id not in database:
+            database[user_id] = {'user_id': user_id, 'faces': []}
+        database[user_id]['faces'].append({'face_id': face_id, 'timestamp': '', 'metadata': {}})
+        face_embeddings[face_id] = embeddings[i]
+    return database, face_embeddings
+
+def synthetic_texts(n_texts: int, rng: np.random.Generator) -> List[str]:
+    """Course feedback sentences with names, places and mixed sentiment."""
+    openers = ["The lecture on", "Professor Smith's class about", "Today's lab on",
+               "The tutorial in Boston covering", "Dr. Garcia's seminar on"]
+    topics = ["linear algebra", "neural networks", "organic chemistry", "World War II",
+              "data structures", "microeconomics", "thermodynamics"]
+    verdicts = ["was really helpful and well organized", "was confusing and far too fast",
+                "was okay but the slides were hard to read", "made the exam much easier",
+                "needs more examples", "was the best session this semester",
+                "ran late again and nobody answered questions"]
+    extras = ["", " Thanks!", " Please post the notes on Canvas.", " I emailed Microsoft about the internship.",
+              " The homework due Friday is too long.", " Great job!"]
+    return [
+        f"{rng.choice(openers)} {rng.choice(topics)} {rng.choice(verdicts)}.{rng.choice(extras)}"
+        for _ in range(n_texts)
+    ]
+
+def encode_image(image: np.ndarray) -> str:
+    """JPEG-encode a frame as base64 text, as clients send it to the API."""
+    ok, buffer = cv2.imencode('.jpg', image)
+    if not ok:
+        raise ValueError("Failed to encode image")
+    return base64.b64encode(buffer.tobytes()).decode('ascii')
+
+def measure(fn: Callable[[int], object], items_per_call: int,
+            config: BenchmarkConfig) -> Dict:
+    """Time repeated calls of ``fn(i)`` and summarize latency and throughput.
+    
+    Runs at least ``min_runs`` and at most ``max_runs`` timed calls, stopping
+    early once ``max_seconds`` have elapsed.
+    """
+    for i in range(config.warmup):
+        fn(i)
+    
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < config.max_runs and (
+        len(latencies) < config.min_runs or time.perf_counter() - started < config.max_seconds
+    ):
+        call_started = time.perf_counter()
+        fn(config.warmup + len(latencies))
+        latencies.append(time.perf_counter() - call_started)
+    
+    latency_ms = np.asarray(latencies) * 1000.0
+    return {
+        'runs': len(latencies),
+        'items_per_call': items_per_call,
+        'latency_ms': {
+            'mean': float(latency_ms.mean()),
+            'min': float(latency_ms.min()),
+            'p50': float(np.percentile(latency_ms, 50)),
+            'p90': float(np.percentile(latency_ms, 90)),
+            'p95': float(np.percentile(latency_ms, 95)),
+            'p99': float(np.percentile(latency_ms, 99)),
+            'max': float(latency_ms.max())
+        },
+        'throughput_per_second': items_per_call * len(latencies) / sum(latencies)
+    }
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, if the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# Case setups: each returns (fn(i), items per call) for ``measure``
+
+def _case_detect_faces(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from preprocess.facePreprocess import FacePreprocessor
+    preprocessor = FacePreprocessor()
+    return lambda i: preprocessor.detect_faces(images[i % len(images)]), 1
+
+def _case_recognize_face(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from services.faceRecognitionService import FaceRecognitionService, FaceRecognitionConfig
+    service = FaceRecognitionService(FaceRecognitionConfig(
+        model_path=os.path.join(workdir, 'face_recognition'),
+        embeddings_path=os.path.join(workdir, 'face_embeddings.pkl'),
+        database_path=os.path.join(workdir, 'face_database.json'),
+        embedding_dim=config.embedding_dim,
+        max_faces_per_user=config.faces_per_user
+    ))
+    service.face_database, service.face_embeddings = synthetic_gallery(
+        params['gallery_size'], config.embedding_dim, config.faces_per_user,
+        np.random.default_rng(config.seed)
+    )
+    return lambda i: service.recognize_face(images[i % len(images)]), 1
+
+def _case_detect_emotion(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from services.emotionDetectionService import EmotionDetectionService
+    service = EmotionDetectionService()
+    return lambda i: service.detect_emotion(images[i % len(images)]), 1
+
+def _case_detect_emotions_batch(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from services.emotionDetectionService import EmotionDetectionService
+    service = EmotionDetectionService()
+    size = config.emotion_batch_size
+    batch = lambda i: [images[(i * size + k) % len(images)] for k in range(size)]
+    return lambda i: service.detect_emotions_batch(batch(i)), size
+
+def _case_detect_liveness(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from liveness_detection import LivenessDetector
+    detector = LivenessDetector()
+    return lambda i: detector.detect_liveness(images[i % len(images)]), 1
+
+def _case_preprocess_data(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from attendance_prediction import AttendancePredictionModel, create_synthetic_data
+    model = AttendancePredictionModel(model_path=os.path.join(workdir, 'attendance_model.joblib'))
+    data = create_synthetic_data(config.n_records, n_days=365)
+    model.preprocess_data(data, fit=True)
+    return lambda i: model.preprocess_data(data), config.n_records
+
+def _case_nlp_batch_process(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from services.nlpService import NLPService, NLPConfig
+    # Result caching would turn repeated batches into lookups
+    service = NLPService(NLPConfig(result_cache_size=0))
+    rng = np.random.default_rng(config.seed)
+    batches = [synthetic_texts(config.n_texts, rng) for _ in range(4)]
+    analysis_types = list(config.nlp_analysis_types)
+    return lambda i: service.batch_process(batches[i % len(batches)], analysis_types), config.n_texts
+
+def _api_requests(config: BenchmarkConfig, images: List[np.ndarray]) -> Dict[str, Callable[[int], Tuple[str, Dict]]]:
+    """Request builders per API route: ``i -> (method, client kwargs)``."""
+    encoded = [encode_image(image) for image in images[:8]]
+    texts = synthetic_texts(64, np.random.default_rng(config.seed))
+    image = lambda i: encoded[i % len(encoded)]
+    return {
+        '/': lambda i: ('get', {}),
+        '/health/live': lambda i: ('get', {}),
+        '/health/ready': lambda i: ('get', {}),
+        '/metrics': lambda i: ('get', {}),
+        '/api/emotion-detection': lambda i: ('post', {'json': {
+            'image_data': image(i), 'user_id': 'bench'
+        }}),
+        '/api/verify-attendance': lambda i: ('post', {'json': {
+            'user_id': 'bench', 'course_id': 'CS101', 'timestamp': datetime.now().isoformat(),
+            'image_data': image(i), 'location': {'lat': 42.36, 'lng': -71.06}
+        }}),
+        '/api/liveness-detection': lambda i: ('post', {'json': {'image_data': image(i)}}),
+        '/api/analyze-frame': lambda i: ('post', {'json': {
+            'image_data': image(i), 'analyses': ['identity', 'liveness', 'emotion'], 'user_id': 'bench'
+        }}),
+        '/api/analyze-sentiment': lambda i: ('post', {'params': {'text': texts[i % len(texts)]}}),
+        '/api/predict-attendance': lambda i: ('post', {
+            'params': {'user_id': 'bench', 'course_id': 'CS101', 'timestamp': datetime.now().isoformat()},
+            'json': {'lat': 42.36, 'lng': -71.06}
+        })
+    }
+
+# API routes that take a frame
+IMAGE_ROUTES = ('/api/emotion-detection', '/api/verify-attendance',
+                '/api/liveness-detection', '/api/analyze-frame')
+
+def _case_api(config: BenchmarkConfig, params: Dict, images: List[np.ndarray], workdir: str):
+    from fastapi.testclient import TestClient
+    import api
+    # Load and warm models up front; the client is not entered, so lifespan startup does not run
+    api.registry.load_all()
+    if api.registry.is_ready(['face_recognition']):
+        # Enroll a gallery so identity routes time matching, not an empty loop
+        service = api.registry.get('face_recognition')
+        service.face_database, service.face_embeddings = synthetic_gallery(
+            config.api_gallery_size, service.config.embedding_dim, config.faces_per_user,
+            np.random.default_rng(config.seed)
+        )
+    client = TestClient(api.app)
+    build = _api_requests(config, images)[params['route']]
+
+    def call(i):
+        method, kwargs = build(i)
+        response = getattr(client, method)(params['route'], **kwargs)
+        # Error responses skip the work being measured, so they fail the case
+        if not 200 <= response.status_code < 300:
+            raise RuntimeError(f"{params['route']} returned {response.status_code}: {response.text[:200]}")
+    return call, 1
+
+CASES = {
+    'detect_faces': _case_detect_faces,
+    'recognize_face': _case_recognize_face,
+    'detect_emotion': _case_detect_emotion,
+    'detect_emotions_batch': _case_detect_emotions_batch,
+    'detect_liveness': _case_detect_liveness,
+    'preprocess_data': _case_preprocess_data,
+    'nlp_batch_process': _case_nlp_batch_process,
+    'api': _case_api
+}
+
+# Cases whose timings only mean something when the frames contain a detectable face
+FACE_CASES = ('detect_faces', 'recognize_face', 'detect_emotion', 'detect_emotions_batch', 'detect_liveness')
+
+def plan_cases(config: BenchmarkConfig, names: Optional[List[str]] = None) -> List[Tuple[str, Dict]]:
+    """Expand case names into ``(name, params)`` runs, e.g. one per gallery size."""
+    plan = []
+    for name in names or list(CASES):
+        if name not in CASES:
+            raise ValueError(f"Unknown benchmark case: {name}")
+        if name == 'recognize_face':
+            plan.extend((name, {'gallery_size': size}) for size in config.gallery_sizes)
+        elif name == 'api':
+            plan.extend((name, {'route': route}) for route in _api_requests(config, []))
+        else:
+            plan.append((name, {}))
+    return plan
+
+def run_case(name: str, params: Dict, config: BenchmarkConfig) -> Dict:
+    """Set up and measure one case in the current process."""
+    result = {'case': name, 'params': dict(params)}
+    try:
+        images = load_images(config)
+        if name in FACE_CASES or params.get('route') in IMAGE_ROUTES:
+            # Without a detection every call times the early no-face return
+            result['face_detection_rate'] = face_detection_rate(images)
+            if result['face_detection_rate'] == 0:
+                raise ValueError("No face detected in any benchmark frame; pass --images with face photos")
+        
+        with tempfile.TemporaryDirectory(prefix='benchmark_') as workdir:
+            started = time.perf_counter()
+            fn, items_per_call = CASES[name](config, params, images, workdir)
+            result['setup_seconds'] = time.perf_counter() - started
+            result['rss_after_setup_mb'] = _peak_rss_mb()
+            
+            result.update(measure(fn, items_per_call, config))
+            result['peak_rss_mb'] = _peak_rss_mb()
+    
+    except Exception as e:
+        logger.error(f"Error in benchmark case {name} {params}: {str(e)}")
+        result['error'] = f"{type(e).__name__}: {str(e)}"
+    return result
+
+def run_suite(config: Optional[BenchmarkConfig] = None, names: Optional[List[str]] = None,
+              isolate: bool = True, output_path: Optional[str] = None) -> Dict:
+    """Run the benchmark cases and save the results as JSON.
+    
+    Args:
+        config: Benchmark settings
+        names: Case names to run, all by default
+        isolate: Run each case in a fresh process so peak RSS and warm
+            caches are per case, and a crash only fails that case
+        output_path: Result file, a timestamped file in ``output_dir`` by default
+    
+    Returns:
+        Run metadata and one result per case
+    """
+    config = config or BenchmarkConfig()
+    results = []
+    for name, params in plan_cases(config, names):
+        logger.info(f"Benchmarking {name} {params}")
+        if not isolate:
+            results.append(run_case(name, params, config))
+            continue
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results.append(executor.submit(run_case, name, params, config).result())
+        except Exception as e:
+            # The worker died, e.g. out of memory on a large gallery
+            logger.error(f"Benchmark case {name} {params} crashed: {str(e)}")
+            results.append({'case': name, 'params': params, 'error': f"{type(e).__name__}: {str(e)}"})
+    
+    commit = _git_commit()
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': asdict(config),
+        'results': results
+    }
+    
+    output_path = output_path or os.path.join(
+        config.output_dir, f"benchmark-{commit or 'unknown'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Benchmark results saved to {output_path}")
+    report['output_path'] = output_path
+    return report
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float = 0.1) -> Dict:
+    """Compare two suite reports case by case.
+    
+    A case regresses when its p50 latency or peak RSS grows, or its
+    throughput drops, by more than ``tolerance`` (a fraction). Failed
+    cases are left out of the comparison.
+    """
+    key = lambda result: (result['case'], json.dumps(result['params'], sort_keys=True))
+    previous = {key(result): result for result in baseline['results'] if 'error' not in result}
+    comparison = {'baseline_commit': baseline.get('commit'), 'commit': current.get('commit'),
+                  'regressions': [], 'improvements': [], 'cases': []}
+    
+    for result in current['results']:
+        before = previous.get(key(result))
+        if before is None or 'error' in result:
+            continue
+        changes = {
+            'p50_ms': (before['latency_ms']['p50'], result['latency_ms']['p50'], 1),
+            'throughput_per_second': (before['throughput_per_second'], result['throughput_per_second'], -1),
+            'peak_rss_mb': (before.get('peak_rss_mb') or 0.0, result.get('peak_rss_mb') or 0.0, 1)
+        }
+        entry = {'case': result['case'], 'params': result['params']}
+        for metric, (old, new, direction) in changes.items():
+            ratio = new / old - 1.0 if old else 0.0
+            entry[metric] = {'baseline': old, 'current': new, 'change': ratio}
+            if direction * ratio > tolerance:
+                comparison['regressions'].append({**entry, 'metric': metric})
+            elif direction * ratio < -tolerance:
+                comparison['improvements'].append({**entry, 'metric': metric})
+        comparison['cases'].append(entry)
+    return comparison
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ENGINE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: List[str]) -> int:
+    """CLI: ``python benchmark_suite.py [--cases a,b] [--compare BASELINE.json]``."""
+    parser = argparse.ArgumentParser(description="Benchmark the face, emotion, liveness, attendance and NLP hot paths")
+    parser.add_argument('--cases', default=None, help=f"Comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument('--gallery-sizes', default=None, help="Comma-separated gallery sizes for recognize_face")
+    parser.add_argument('--max-runs', type=int, default=None)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    parser.add_argument('--quick', action='store_true', help="Small galleries and short timing budgets")
+    parser.add_argument('--images', default=None, help="Directory of face photos to use instead of synthetic frames")
+    parser.add_argument('--in-process', action='store_true', help="Run cases in this process")
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', default=None, help="Baseline result file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+    
+    config = BenchmarkConfig()
+    if args.quick:
+        config.gallery_sizes = (1_000, 10_000)
+        config.max_runs = 30
+        config.max_seconds = 5.0
+        config.n_records = 1_000
+        config.n_texts = 32
+    if args.gallery_sizes:
+        config.gallery_sizes = tuple(int(size) for size in args.gallery_sizes.split(','))
+    if args.max_runs:
+        config.max_runs = args.max_runs
+    if args.max_seconds:
+        config.max_seconds = args.max_seconds
+    if args.images:
+        config.image_dir = args.images
+    
+    report = run_suite(
+        config,
+        names=args.cases.split(',') if args.cases else None,
+        isolate=not args.in_process,
+        output_path=args.output
+    )
+    for result in report['results']:
+        label = f"{result['case']} {json.dumps(result['params'])}" if result['params'] else result['case']
+        if 'error' in result:
+            print(f"{label}: ERROR {result['error']}")
+        else:
+            latency = result['latency_ms']
+            print(f"{label}: p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, "
+                  f"p99 {latency['p99']:.2f} ms, {result['throughput_per_second']:.1f} items/s, "
+                  f"peak RSS {result['peak_rss_mb'] or 0:.0f} MB")
+    
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            comparison = compare_results(json.load(f), report, args.tolerance)
+        print(json.dumps({k: comparison[k] for k in ('baseline_commit', 'commit', 'regressions', 'improvements')}, indent=2))
+        return 1 if comparison['regressions'] else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -11,6 +11,11 @@ import tensorflow as tf
 from scipy.spatial import distance
 import mediapipe as mp
 import os
+import sys
+
+# Shared tracing from the ai/ package
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai'))
+from monitoring.tracing import record_model_call, span, traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -66,13 +71,41 @@ class LivenessDetector:
         except Exception as e:
             logger.error(f"Error loading anti-spoofing model: {str(e)}")
             self.anti_spoofing_model = None
+
+    def warmup(self) -> Dict:
+        """Run a blank frame through face detection, face mesh and anti-spoofing."""
+        try:
+            started = time.perf_counter()
+            rgb_frame = np.zeros((240, 320, 3), dtype=np.uint8)
+            face_recognition.face_locations(rgb_frame)
+            self.face_mesh.process(rgb_frame)
+            self.check_anti_spoofing(rgb_frame[:128, :128])
+            
+            return {
+                'success': True,
+                'seconds': time.perf_counter() - started,
+                'anti_spoofing_model': self.anti_spoofing_model is not None
+            }
+        
+        except Exception as e:
+            logger.error(f"Error warming up liveness detector: {str(e)}")
+            return {'success': False, 'error': str(e)}
             
-    def detect_liveness(self, frame: np.ndarray) -> Tuple[bool, Dict]:
+    @traced('liveness.detect')
+    def detect_liveness(self, frame: np.ndarray,
+                        face_location: Optional[Tuple[int, int, int, int]] = None,
+                        use_motion: bool = True) -> Tuple[bool, Dict]:
         """
         Perform comprehensive liveness detection on a frame.
         
         Args:
             frame: Input frame from video stream
+            face_location: Face box as ``(top, right, bottom, left)`` from a
+                detector the caller already ran; skips HOG face detection
+            use_motion: Score motion against the previous frame passed to
+                this detector. Only meaningful when one detector follows one
+                video stream; turn it off for independent single frames, and
+                the motion check is left out of the decision.
             
         Returns:
             Tuple of (is_live, details_dict)
@@ -82,12 +115,15 @@ class LivenessDetector:
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
             # Detect faces
-            face_locations = face_recognition.face_locations(rgb_frame)
-            if not face_locations:
-                return False, {"error": "No face detected"}
-            
-            # Get the largest face
-            face_location = max(face_locations, key=lambda rect: (rect[2] - rect[0]) * (rect[1] - rect[3]))
+            if face_location is None:
+                with span('liveness.face_detect'):
+                    face_locations = face_recognition.face_locations(rgb_frame)
+                record_model_call('liveness_face_detector')
+                if not face_locations:
+                    return False, {"error": "No face detected"}
+                
+                # Get the largest face
+                face_location = max(face_locations, key=lambda rect: (rect[2] - rect[0]) * (rect[1] - rect[3]))
             top, right, bottom, left = face_location
             
             # Check face size
@@ -97,14 +133,16 @@ class LivenessDetector:
             
             # Get face landmarks
             face = dlib.rectangle(left, top, right, bottom)
-            landmarks = self.landmark_predictor(rgb_frame, face)
+            with span('liveness.landmarks'):
+                landmarks = self.landmark_predictor(rgb_frame, face)
+            record_model_call('liveness_landmarks')
             
             # Perform various liveness checks
             blink_score = self.detect_blink(landmarks)
             smile_score = self.detect_smile(landmarks)
             head_pose = self.detect_head_pose(landmarks)
             texture_score = self.analyze_face_texture(rgb_frame[top:bottom, left:right])
-            motion_score = self.detect_motion(frame)
+            motion_score = self.detect_motion(frame) if use_motion else None
             depth_score = self.estimate_facial_depth(landmarks)
             anti_spoofing_score = self.check_anti_spoofing(rgb_frame[top:bottom, left:right])
             
@@ -114,24 +152,27 @@ class LivenessDetector:
                 'smile': smile_score,
                 'head_pose': head_pose,
                 'texture': texture_score,
-                'motion': motion_score,
                 'depth': depth_score,
                 'anti_spoofing': anti_spoofing_score
             }
-            
-            # Calculate final liveness score
-            is_live = all([
+            checks = [
                 blink_score > self.config.blink_threshold,
                 smile_score > self.config.smile_threshold,
                 abs(head_pose) < self.config.head_pose_threshold,
                 texture_score > self.config.confidence_threshold,
-                motion_score > self.config.motion_threshold,
                 depth_score > self.config.confidence_threshold,
                 anti_spoofing_score > self.config.confidence_threshold
-            ])
+            ]
+            if use_motion:
+                scores['motion'] = motion_score
+                checks.append(motion_score > self.config.motion_threshold)
+            
+            # Calculate final liveness score
+            is_live = all(checks)
             
             return is_live, {
                 'scores': scores,
+                'skipped_checks': [] if use_motion else ['motion'],
                 'face_location': face_location,
                 'landmarks': self._landmarks_to_list(landmarks)
             }
@@ -185,6 +226,7 @@ class LivenessDetector:
             logger.error(f"Error in head pose detection: {str(e)}")
             return 0.0
             
+    @traced('liveness.texture')
     def analyze_face_texture(self, face_region: np.ndarray) -> float:
         """Analyze face texture for anti-spoofing."""
         try:
@@ -205,6 +247,7 @@ class LivenessDetector:
             logger.error(f"Error in texture analysis: {str(e)}")
             return 0.0
             
+    @traced('liveness.motion')
     def detect_motion(self, frame: np.ndarray) -> float:
         """Detect natural head motion."""
         try:
@@ -256,6 +299,7 @@ class LivenessDetector:
             logger.error(f"Error in depth estimation: {str(e)}")
             return 0.0
             
+    @traced('liveness.anti_spoofing')
     def check_anti_spoofing(self, face_region: np.ndarray) -> float:
         """Perform anti-spoofing check using deep learning model."""
         try:
@@ -269,6 +313,7 @@ class LivenessDetector:
             
             # Get prediction
             prediction = self.anti_spoofing_model.predict(face_region)[0][0]
+            record_model_call('anti_spoofing')
             return float(prediction)
         except Exception as e:
             logger.error(f"Error in anti-spoofing check: {str(e)}")
@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ModelState:
+    """Load state of one registered model."""
+    name: str
+    required: bool = True  # readiness waits for required models only
+    status: str = "pending"  # pending, loading, warming, ready or failed
+    load_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ModelNotReady(RuntimeError):
+    """Raised when a model is requested before it finished loading."""
+
+class ModelRegistry:
+    """Loads and warms models in parallel and tracks per-model readiness.
+    
+    Models are registered as a loader plus an optional warm-up callable,
+    so nothing heavy is imported or built until ``load_all`` runs. The
+    startup time of each model and the cold start of the whole process
+    are kept for the readiness endpoint and logs.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, started: Optional[float] = None):
+        """Initialize an empty registry.
+        
+        Args:
+            max_workers: Threads used to load models, default one per model
+            started: ``time.perf_counter()`` value cold start is measured from,
+                default the registry creation time
+        """
+        self.max_workers = max_workers
+        self.started = started if started is not None else time.perf_counter()
+        self.states: Dict[str, ModelState] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._warmups: Dict[str, Optional[Callable[[Any], Any]]] = {}
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self.load_started = None
+        self.load_finished = None
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 warmup: Optional[Callable[[Any], Any]] = None, required: bool = True):
+        """Register a model.
+        
+        Args:
+            name: Model name used by ``get`` and in status reports
+            loader: Callable building the model; heavy imports belong inside it
+            warmup: Callable run once on the loaded model with dummy inputs,
+                so lazy initialisation and graph tracing happen at startup
+                instead of on the first request. A returned dict with
+                ``success`` False fails the model.
+            required: Whether readiness waits for this model
+        """
+        self._loaders[name] = loader
+        self._warmups[name] = warmup
+        self.states[name] = ModelState(name=name, required=required)
+
+    def start(self) -> threading.Thread:
+        """Load all models on a background thread and return immediately."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.load_all, name='model-loader', daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def load_all(self) -> Dict:
+        """Load and warm every registered model in parallel.
+        
+        Returns:
+            Status report, as from ``status``
+        """
+        self.load_started = time.perf_counter()
+        names = list(self._loaders)
+        if names:
+            workers = self.max_workers or len(names)
+            with ThreadPoolExecutor(max_workers=min(workers, len(names)), thread_name_prefix='model-load') as executor:
+                list(executor.map(self._load, names))
+        self.load_finished = time.perf_counter()
+        self._done.set()
+        
+        report = self.status()
+        failed = [name for name, state in self.states.items() if state.status == 'failed']
+        logger.info(
+            f"Models loaded in {report['load_seconds']:.2f}s, "
+            f"cold start {report['cold_start_seconds']:.2f}s"
+            + (f", failed: {', '.join(failed)}" if failed else "")
+        )
+        return report
+
+    def _load(self, name: str):
+        state = self.states[name]
+        try:
+            state.status = 'loading'
+            started = time.perf_counter()
+            model = self._loaders[name]()
+            state.load_seconds = time.perf_counter() - started
+            
+            warmup = self._warmups[name]
+            if warmup is not None:
+                state.status = 'warming'
+                started = time.perf_counter()
+                result = warmup(model)
+                if isinstance(result, dict) and not result.get('success', True):
+                    raise RuntimeError(f"Warm-up failed: {result.get('error')}")
+                state.warmup_seconds = time.perf_counter() - started
+            
+            with self._lock:
+                self._models[name] = model
+            state.status = 'ready'
+            logger.info(f"Model {name} ready (load {state.load_seconds:.2f}s, "
+                        f"warm-up {state.warmup_seconds or 0.0:.2f}s)")
+        except Exception as e:
+            state.status = 'failed'
+            state.error = str(e)
+            logger.error(f"Error loading model {name}: {str(e)}")
+
+    def get(self, name: str) -> Any:
+        """Loaded model ``name``.
+        
+        Raises:
+            ModelNotReady: If the model is not registered or not ready yet
+        """
+        model = self._models.get(name)
+        if model is None:
+            state = self.states.get(name)
+            raise ModelNotReady(f"Model {name} is not ready ({state.status if state else 'not registered'})")
+        return model
+
+    def is_ready(self, names: Optional[List[str]] = None) -> bool:
+        """Whether the given models, default all required ones, are ready."""
+        if names is None:
+            names = [name for name, state in self.states.items() if state.required]
+        return all(name in self.states and self.states[name].status == 'ready' for name in names)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until loading finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict:
+        """Per-model state plus load and cold start timings."""
+        now = time.perf_counter()
+        loaded = self.load_finished is not None
+        return {
+            'ready': self.is_ready(),
+            'loading': self.load_started is not None and not loaded,
+            'models': {name: asdict(state) for name, state in self.states.items()},
+            'load_seconds': (self.load_finished - self.load_started) if loaded else None,
+            'cold_start_seconds': (self.load_finished - self.started) if loaded else None,
+            'uptime_seconds': now - self.started
+        }
+
+def models_from_env(default: List[str], variable: str = 'AI_MODELS') -> List[str]:
+    """Model names from a comma-separated environment variable, or ``default``."""
+    value = os.environ.get(variable)
+    if value is None:
+        return list(default)
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+if __name__ == "__main__":
+    # Fake models with different load and warm-up times, one failing
+    registry = ModelRegistry()
+    registry.register('fast', lambda: 'fast-model', warmup=lambda model: time.sleep(0.1))
+    registry.register('slow', lambda: time.sleep(0.5) or 'slow-model', warmup=lambda model: time.sleep(0.2))
+    registry.register('broken', lambda: 1 / 0, required=False)
+    
+    registry.start()
+    print("ready before load:", registry.is_ready())
+    registry.wait()
+    print("ready after load:", registry.is_ready())
+    print(registry.status())
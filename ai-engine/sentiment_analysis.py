@@ -1,7 +1,21 @@
 from textblob import TextBlob
+from textblob import _text as pattern_text
+from textblob.en import sentiment as pattern_sentiment
 import logging
-from typing import List, Dict, Union
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import argparse
+import csv
+import glob
+import itertools
+import json
 import os
+import random
+import re
+import sys
+import time
 
 # Create directories if they don't exist
 os.makedirs('models', exist_ok=True)
@@ -11,9 +25,212 @@ os.makedirs('reports', exist_ok=True)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SentimentAnalyzer:
+class LexiconSentimentScorer:
+    """TextBlob's pattern sentiment scoring over a precompiled lexicon.
+    
+    The pattern lexicon is flattened once into a word -> (polarity,
+    subjectivity, intensity, is_modifier) dict, so scoring avoids TextBlob
+    object construction, lazy-dict dispatch and per-assessment dicts, while
+    applying the same negation, modifier, exclamation and emoticon rules.
+    Tokenization is a port of pattern's ``find_tokens`` that memoizes the
+    per-token punctuation splitting, so scores match TextBlob exactly.
+    
+    Tokenization reads TextBlob's private ``_text`` module, so the TextBlob
+    version is pinned in requirements.txt; rerun ``benchmark_lexicon_scorer``,
+    which checks parity, before bumping it.
+    """
+    
+    SPLIT_CACHE_SIZE = 100000
+    LINEBREAK = re.compile(r"\n{2,}")
+    WHITESPACE = re.compile(r"\s+")
+    
     def __init__(self):
-        """Initialize the sentiment analyzer."""
+        # Triggers the lazy load of the pattern lexicon
+        len(pattern_sentiment)
+        
+        self._split_cache = {}
+        self.negations = frozenset(pattern_sentiment.negations)
+        modifiers = pattern_sentiment.modifiers
+        self.lexicon = {
+            word: (*tags[None], any(tag in tags for tag in modifiers))
+            for word, tags in dict.items(pattern_sentiment)
+        }
+        
+        # Lowercased emoticon -> polarity, first match in EMOTICONS order wins
+        self.emoticons = {}
+        for (_, polarity), emoticons in pattern_text.EMOTICONS.items():
+            for emoticon in emoticons:
+                self.emoticons.setdefault(emoticon.lower(), polarity)
+        logger.info(f"Lexicon sentiment scorer compiled ({len(self.lexicon)} words)")
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercased tokens, as TextBlob's pattern analyzer sees them."""
+        return [word.lower() for word in " ".join(self._find_tokens(text)).split()]
+
+    def _find_tokens(self, string: str) -> List[str]:
+        """``pattern_text.find_tokens`` with default arguments."""
+        eos = pattern_text.EOS
+        
+        # Contractions; the replacement patterns contain no regex syntax
+        for a, b in pattern_text.replacements.items():
+            string = string.replace(a, b)
+        string = (
+            string.replace("“", " “ ")
+            .replace("”", " ” ")
+            .replace("‘", " ‘ ")
+            .replace("’", " ’ ")
+            .replace("'", " ' ")
+            .replace('"', ' " ')
+        )
+        string = string.replace("\r\n", "\n")
+        string = self.LINEBREAK.sub(f" {eos} ", string)
+        string = self.WHITESPACE.sub(" ", string)
+        
+        tokens = []
+        cache = self._split_cache
+        for t in pattern_text.TOKEN.findall(string + " "):
+            split = cache.get(t)
+            if split is None:
+                split = self._split_token(t)
+                if len(cache) >= self.SPLIT_CACHE_SIZE:
+                    cache.clear()
+                cache[t] = split
+            tokens.extend(split)
+        
+        # Sentence boundaries decide where EOS markers are dropped and
+        # limit the sarcasm and emoticon patterns
+        sentences, i, j = [[]], 0, 0
+        while j < len(tokens):
+            if tokens[j] in ("...", ".", "!", "?", eos):
+                while j < len(tokens) and tokens[j] in ("'", '"', "”", "’", "...", ".", "!", "?", ")", eos):
+                    if tokens[j] in ("'", '"') and sentences[-1].count(tokens[j]) % 2 == 0:
+                        break
+                    j += 1
+                sentences[-1].extend(t for t in tokens[i:j] if t != eos)
+                sentences.append([])
+                i = j
+            j += 1
+        sentences[-1].extend(tokens[i:j])
+        sentences = (" ".join(s) for s in sentences if len(s) > 0)
+        sentences = (pattern_text.RE_SARCASM.sub("(!)", s) for s in sentences)
+        return [
+            pattern_text.RE_EMOTICONS.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), s)
+            for s in sentences
+        ]
+
+    @staticmethod
+    def _split_token(t: str) -> List[str]:
+        """Split leading and trailing punctuation off one raw token."""
+        punctuation = tuple(pattern_text.PUNCTUATION.replace(".", ""))
+        replace = pattern_text.replacements
+        abbreviations = pattern_text.ABBREVIATIONS
+        
+        head, tail = [], []
+        while t.startswith(punctuation) and t not in replace:
+            head.append(t[0])
+            t = t[1:]
+        while t.endswith(punctuation + (".",)) and t not in replace:
+            if t.endswith(punctuation):
+                tail.append(t[-1])
+                t = t[:-1]
+            # Split ellipsis (...) before splitting period
+            if t.endswith("..."):
+                tail.append("...")
+                t = t[:-3].rstrip(".")
+            # Split period (if not an abbreviation)
+            if t.endswith("."):
+                if (
+                    t in abbreviations
+                    or pattern_text.RE_ABBR1.match(t) is not None
+                    or pattern_text.RE_ABBR2.match(t) is not None
+                    or pattern_text.RE_ABBR3.match(t) is not None
+                ):
+                    break
+                tail.append(t[-1])
+                t = t[:-1]
+        if t != "":
+            head.append(t)
+        head.extend(reversed(tail))
+        return head
+
+    def score(self, text: str) -> Tuple[float, float]:
+        """Polarity and subjectivity of one text."""
+        return self.score_tokens(self.tokenize(text))
+
+    def score_batch(self, texts: List[str]) -> List[Tuple[float, float]]:
+        """Polarity and subjectivity for each text.
+        
+        Texts are scored one at a time: negations and modifiers carry
+        state from token to token, so the speedup over TextBlob comes from
+        skipping its per-text object overhead, not from vectorization.
+        """
+        return [self.score_tokens(self.tokenize(text)) for text in texts]
+
+    def score_tokens(self, words: List[str]) -> Tuple[float, float]:
+        """Score lowercased tokens; mirrors ``Sentiment.assessments``."""
+        negations = self.negations
+        punctuation = pattern_text.PUNCTUATION
+        entries = list(map(self.lexicon.get, words))
+        
+        # Assessments as [polarity, subjectivity, intensity, negated]
+        assessed = []
+        modifier = None  # preceding known adverb
+        negation = None  # preceding negation
+        for word, entry in zip(words, entries):
+            if entry is not None:
+                polarity, subjectivity, intensity, is_modifier = entry
+                if modifier is None:
+                    assessed.append([polarity, subjectivity, intensity, False])
+                else:
+                    # "really good": scale by the modifier's intensity
+                    last = assessed[-1]
+                    last[0] = max(-1.0, min(polarity * last[2], +1.0))
+                    last[1] = max(-1.0, min(subjectivity * last[2], +1.0))
+                    last[2] = intensity
+                if negation is not None:
+                    last = assessed[-1]
+                    last[2] = 1.0 / last[2]
+                    last[3] = True
+                modifier = word if is_modifier else None
+                negation = word if word in negations else None
+            else:
+                if word in negations:
+                    negation = word
+                elif negation and len(word.strip("'")) > 1:
+                    negation = None
+                # "really not good"
+                if negation is not None and modifier is not None and modifier.endswith("ly"):
+                    assessed[-1][3] = True
+                    negation = None
+                elif modifier and len(word) > 2:
+                    modifier = None
+                # Exclamation marks boost the previous word
+                if word == "!" and assessed:
+                    assessed[-1][0] = max(-1.0, min(assessed[-1][0] * 1.25, +1.0))
+                # Sarcasm mark
+                if word == "(!)":
+                    assessed.append([0.0, 1.0, 1.0, False])
+                if not word.isalpha() and len(word) <= 5 and word not in punctuation:
+                    polarity = self.emoticons.get(word)
+                    if polarity is not None:
+                        assessed.append([polarity, 1.0, 1.0, False])
+        
+        if not assessed:
+            return 0.0, 0.0
+        # "not good" = slightly bad, "not bad" = slightly good
+        polarity = sum(p * -0.5 if negated else p for p, _, _, negated in assessed)
+        subjectivity = sum(a[1] for a in assessed)
+        return polarity / float(len(assessed)), subjectivity / float(len(assessed))
+
+class SentimentAnalyzer:
+    def __init__(self, use_compiled_lexicon: bool = True):
+        """Initialize the sentiment analyzer.
+        
+        Args:
+            use_compiled_lexicon: Score with ``LexiconSentimentScorer``
+                instead of building a TextBlob per text; results are the same
+        """
+        self.scorer = LexiconSentimentScorer() if use_compiled_lexicon else None
         logger.info("Sentiment analyzer initialized")
         
     def analyze_sentiment(self, text: Union[str, List[str]]) -> Dict:
@@ -33,23 +250,16 @@ class SentimentAnalyzer:
             else:
                 texts = text
                 
+            if self.scorer is not None:
+                scores = self.scorer.score_batch(texts)
+            else:
+                scores = [tuple(TextBlob(t).sentiment) for t in texts]
+            
             results = []
-            for t in texts:
-                analysis = TextBlob(t)
-                polarity = analysis.sentiment.polarity
-                subjectivity = analysis.sentiment.subjectivity
-                
-                # Determine sentiment label
-                if polarity > 0.3:
-                    label = "positive"
-                elif polarity < -0.3:
-                    label = "negative"
-                else:
-                    label = "neutral"
-                    
+            for t, (polarity, subjectivity) in zip(texts, scores):
                 results.append({
                     'text': t,
-                    'label': label,
+                    'label': sentiment_label(polarity),
                     'polarity': float(polarity),
                     'subjectivity': float(subjectivity)
                 })
@@ -80,6 +290,249 @@ class SentimentAnalyzer:
             logger.error(f"Error in batch sentiment analysis: {str(e)}")
             return []
 
+    def analyze_stream(self, records: Iterable[Union[str, Tuple]], chunk_size: int = 1000,
+                       workers: int = 1) -> Iterator[Dict]:
+        """Lazily analyze a stream of texts without echoing them back.
+        
+        Args:
+            records: Texts, or ``(record_id, text)`` pairs
+            chunk_size: Texts per worker task
+            workers: Worker processes; 1 scores in-process
+            
+        Yields:
+            Dict with ``id``, ``label``, ``polarity`` and ``subjectivity``,
+            in input order
+        """
+        for chunk in self._iter_scored_chunks(records, chunk_size, workers):
+            yield from chunk
+
+    def _iter_scored_chunks(self, records: Iterable[Union[str, Tuple]], chunk_size: int,
+                            workers: int) -> Iterator[List[Dict]]:
+        """Score records chunk by chunk, at most two chunks per worker in flight."""
+        def id_text_pairs():
+            for index, record in enumerate(records):
+                yield (index, record) if isinstance(record, str) else record
+        
+        pairs = id_text_pairs()
+        chunks = iter(lambda: list(itertools.islice(pairs, chunk_size)), [])
+        
+        if workers <= 1:
+            for chunk in chunks:
+                texts = [text for _, text in chunk]
+                scores = self.scorer.score_batch(texts) if self.scorer is not None else [
+                    tuple(TextBlob(text).sentiment) for text in texts
+                ]
+                yield _format_scores(chunk, scores)
+            return
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_stream_worker,
+            initargs=(self.scorer is not None,)
+        ) as executor:
+            pending = deque()
+            try:
+                for chunk in chunks:
+                    future = executor.submit(_score_texts, [text for _, text in chunk])
+                    pending.append((chunk, future))
+                    if len(pending) >= workers * 2:
+                        chunk, future = pending.popleft()
+                        yield _format_scores(chunk, future.result())
+                while pending:
+                    chunk, future = pending.popleft()
+                    yield _format_scores(chunk, future.result())
+            finally:
+                # Consumer stopped early or a worker failed
+                for _, future in pending:
+                    future.cancel()
+
+    def run_stream_job(self, input_path: str, output_path: str, text_field: str = 'text',
+                       id_field: str = 'id', chunk_size: int = 10000, workers: int = 1,
+                       checkpoint_path: Optional[str] = None, resume: bool = True) -> Dict:
+        """Analyze a feedback file into JSONL or Parquet output, resumably.
+        
+        Results are written after every chunk, followed by a checkpoint of
+        the input records and output written so far. A rerun after a crash
+        drops output past the last checkpoint and continues from there.
+        
+        Args:
+            input_path: ``.jsonl`` or ``.csv`` feedback file
+            output_path: ``.jsonl`` file, or a ``.parquet`` directory of
+                one part file per chunk
+            text_field: Column/field holding the text
+            id_field: Column/field identifying a record; the row number is
+                used when absent
+            chunk_size: Records per chunk and checkpoint
+            workers: Worker processes
+            checkpoint_path: Defaults to ``<output_path>.checkpoint.json``
+            resume: Continue from an existing checkpoint instead of restarting
+            
+        Returns:
+            Records processed in this run and in total
+        """
+        try:
+            checkpoint_path = checkpoint_path or f"{output_path.rstrip(os.sep)}.checkpoint.json"
+            parquet = output_path.rstrip(os.sep).endswith('.parquet')
+            
+            checkpoint = {'input': os.path.abspath(input_path), 'records_done': 0,
+                          'output_bytes': 0, 'parts': 0, 'complete': False}
+            if resume and os.path.exists(checkpoint_path):
+                with open(checkpoint_path, 'r') as f:
+                    saved = json.load(f)
+                if saved['input'] != checkpoint['input']:
+                    raise ValueError(f"Checkpoint {checkpoint_path} belongs to {saved['input']}")
+                checkpoint = saved
+                logger.info(f"Resuming after {checkpoint['records_done']} records")
+            if checkpoint['complete']:
+                return {'success': True, 'records': 0, 'total_records': checkpoint['records_done']}
+            
+            # Discard output written after the last checkpoint
+            if parquet:
+                os.makedirs(output_path, exist_ok=True)
+                for part in glob.glob(os.path.join(output_path, 'part-*.parquet')):
+                    if int(os.path.basename(part)[5:10]) >= checkpoint['parts']:
+                        os.remove(part)
+                writer = _ParquetPartWriter(output_path, checkpoint['parts'])
+            else:
+                os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+                writer = open(output_path, 'ab')
+                writer.truncate(checkpoint['output_bytes'])
+            
+            records = itertools.islice(
+                iter_feedback(input_path, text_field, id_field), checkpoint['records_done'], None
+            )
+            processed = 0
+            start = time.perf_counter()
+            try:
+                for chunk in self._iter_scored_chunks(records, chunk_size, workers):
+                    if parquet:
+                        writer.write(chunk)
+                        checkpoint['parts'] = writer.parts
+                    else:
+                        writer.write(''.join(json.dumps(result) + '\n' for result in chunk).encode('utf-8'))
+                        writer.flush()
+                        os.fsync(writer.fileno())
+                        checkpoint['output_bytes'] = writer.tell()
+                    processed += len(chunk)
+                    checkpoint['records_done'] += len(chunk)
+                    _save_checkpoint(checkpoint_path, checkpoint)
+            finally:
+                if not parquet:
+                    writer.close()
+            
+            checkpoint['complete'] = True
+            _save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Analyzed {processed} records in {elapsed:.1f}s")
+            
+            return {
+                'success': True,
+                'records': processed,
+                'total_records': checkpoint['records_done'],
+                'records_per_second': processed / elapsed if elapsed else None,
+                'output': output_path
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in streaming sentiment job: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+def sentiment_label(polarity: float) -> str:
+    """Map polarity to a positive/negative/neutral label."""
+    if polarity > 0.3:
+        return "positive"
+    elif polarity < -0.3:
+        return "negative"
+    return "neutral"
+
+def iter_feedback(path: str, text_field: str = 'text',
+                  id_field: str = 'id') -> Iterator[Tuple[object, str]]:
+    """Lazily read ``(record_id, text)`` pairs from a JSONL or CSV file.
+    
+    The row number stands in for the id when ``id_field`` is missing.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            yield row.get(id_field, index), row.get(text_field) or ''
+
+def _format_scores(chunk: List[Tuple], scores: List[Tuple[float, float]]) -> List[Dict]:
+    return [
+        {
+            'id': record_id,
+            'label': sentiment_label(polarity),
+            'polarity': float(polarity),
+            'subjectivity': float(subjectivity)
+        }
+        for (record_id, _), (polarity, subjectivity) in zip(chunk, scores)
+    ]
+
+# Per-process scorer for streaming workers
+_worker_scorer = None
+
+def _init_stream_worker(use_compiled_lexicon: bool):
+    global _worker_scorer
+    _worker_scorer = LexiconSentimentScorer() if use_compiled_lexicon else None
+
+def _score_texts(texts: List[str]) -> List[Tuple[float, float]]:
+    if _worker_scorer is not None:
+        return _worker_scorer.score_batch(texts)
+    return [tuple(TextBlob(text).sentiment) for text in texts]
+
+def _save_checkpoint(path: str, checkpoint: Dict):
+    """Write a checkpoint atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({**checkpoint, 'updated': datetime.now().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+class _ParquetPartWriter:
+    """Writes each chunk as the next ``part-NNNNN.parquet`` file."""
+    
+    def __init__(self, directory: str, parts: int = 0):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required to write Parquet output")
+        self.pa, self.pq = pa, pq
+        self.directory = directory
+        self.parts = parts
+
+    def write(self, results: List[Dict]):
+        path = os.path.join(self.directory, f"part-{self.parts:05d}.parquet")
+        self.pq.write_table(self.pa.Table.from_pylist(results), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self.parts += 1
+
+def main_stream(argv: List[str]) -> int:
+    """CLI: ``python sentiment_analysis.py stream INPUT OUTPUT [options]``."""
+    parser = argparse.ArgumentParser(description="Stream sentiment analysis over a feedback file")
+    parser.add_argument('input', help=".jsonl or .csv feedback file")
+    parser.add_argument('output', help=".jsonl file or .parquet directory")
+    parser.add_argument('--text-field', default='text')
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--no-resume', action='store_true', help="Restart instead of resuming")
+    args = parser.parse_args(argv)
+    
+    result = SentimentAnalyzer().run_stream_job(
+        args.input, args.output,
+        text_field=args.text_field,
+        id_field=args.id_field,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        resume=not args.no_resume
+    )
+    print(json.dumps(result, indent=2))
+    return 0 if result['success'] else 1
+
 def create_sample_data() -> List[str]:
     """Create sample data for testing."""
     return [
@@ -90,7 +543,52 @@ def create_sample_data() -> List[str]:
         "Too much homework and unclear instructions."
     ]
 
+def benchmark_lexicon_scorer(texts: List[str] = None, n_texts: int = 20000) -> Dict:
+    """Compare the compiled scorer with per-text TextBlob on a reference corpus.
+    
+    Args:
+        texts: Reference corpus; a synthetic one is generated if omitted
+        n_texts: Size of the synthetic corpus
+        
+    Returns:
+        Timings, speedup and the number of texts whose scores differ
+    """
+    if texts is None:
+        rng = random.Random(42)
+        vocabulary = ' '.join(create_sample_data()).split() + [
+            'not', 'never', 'very', 'really', 'extremely', 'good', 'bad', 'boring',
+            '!', ':)', ':-(', '(!)', "isn't", 'helpful', 'awful', 'a', 'the', 'lecture'
+        ]
+        texts = [
+            ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(3, 30)))
+            for _ in range(n_texts)
+        ]
+    scorer = LexiconSentimentScorer()
+    
+    start = time.perf_counter()
+    reference = [tuple(TextBlob(t).sentiment) for t in texts]
+    textblob_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    compiled = scorer.score_batch(texts)
+    compiled_seconds = time.perf_counter() - start
+    
+    return {
+        'texts': len(texts),
+        'textblob_seconds': textblob_seconds,
+        'compiled_seconds': compiled_seconds,
+        'speedup': textblob_seconds / compiled_seconds,
+        'mismatches': sum(ref != got for ref, got in zip(reference, compiled))
+    }
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'stream':
+        sys.exit(main_stream(sys.argv[2:]))
+    
+    if '--benchmark' in sys.argv:
+        print(json.dumps(benchmark_lexicon_scorer(), indent=2))
+        sys.exit(0)
+    
     try:
         # Initialize analyzer
         analyzer = SentimentAnalyzer()
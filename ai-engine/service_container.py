@@ -0,0 +1,348 @@
+import base64
+import binascii
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+from model_registry import ModelRegistry
+
+# Shared tracing from the ai/ package
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai'))
+from monitoring.tracing import span
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def decode_image(image_data: str) -> np.ndarray:
+    """Decode a base64 image, optionally a ``data:`` URL, to a BGR array.
+    
+    Raises:
+        ValueError: If the payload is not base64 or not a decodable image
+    """
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[-1]
+    try:
+        raw = base64.b64decode(image_data, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("image_data is not valid base64")
+    
+    image = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("image_data is not a decodable image")
+    return image
+
+class FrameContext:
+    """One decoded frame plus the detection results every analysis shares.
+    
+    Detection and alignment run at most once per frame, on first use, so
+    recognition, emotion and liveness on the same upload reuse one
+    MediaPipe pass instead of each running its own detector.
+    """
+
+    def __init__(self, image: np.ndarray, detector):
+        """Wrap a decoded frame.
+        
+        Args:
+            image: BGR frame
+            detector: ``FacePreprocessor`` used for detection and alignment
+        """
+        self.image = image
+        self.detector = detector
+        self._faces = None
+        self._aligned_face = None
+        self._lock = threading.Lock()
+
+    @property
+    def faces(self) -> List[Dict]:
+        """Detections as ``FacePreprocessor.detect_faces`` returns them."""
+        with self._lock:
+            if self._faces is None:
+                self._faces = self.detector.detect_faces(self.image)
+            return self._faces
+
+    @property
+    def face(self) -> Optional[Dict]:
+        """Largest detected face, the one every analysis runs on."""
+        faces = self.faces
+        if not faces:
+            return None
+        return max(faces, key=lambda face: face['bbox'][2] * face['bbox'][3])
+
+    @property
+    def aligned_face(self) -> Optional[np.ndarray]:
+        """Crop of ``face`` aligned on the eyes, as ``process_image`` builds it."""
+        face = self.face
+        with self._lock:
+            if self._aligned_face is None and face is not None:
+                crop = self.detector.extract_face(self.image, face['bbox'])
+                if crop is not None and face['landmarks']:
+                    crop = self.detector.align_face(crop, face['landmarks'])
+                self._aligned_face = crop
+            return self._aligned_face
+
+    @property
+    def face_location(self) -> Optional[Tuple[int, int, int, int]]:
+        """``face`` clipped to the frame as ``(top, right, bottom, left)``."""
+        face = self.face
+        if face is None:
+            return None
+        x, y, w, h = face['bbox']
+        height, width = self.image.shape[:2]
+        return max(0, y), min(width, x + w), min(height, y + h), max(0, x)
+
+class ServiceContainer:
+    """Process-wide services behind the API.
+    
+    Services are built once by the ``ModelRegistry`` and looked up here by
+    name. Only services in ``LOCKED_SERVICES`` are serialized; the Keras
+    models, the lexicon scorer and the attendance model take concurrent
+    calls, and liveness runs without its motion history. Every method
+    raises ``ModelNotReady`` while the service it needs is still loading.
+    """
+    
+    # Services keeping per-call state that concurrent requests would corrupt
+    LOCKED_SERVICES = frozenset({
+        'face_detection'  # MediaPipe graphs process one image at a time
+    })
+
+    # Frame analysis -> service it runs on
+    FRAME_ANALYSES = {
+        'identity': 'face_recognition',
+        'emotion': 'emotion_detection',
+        'anti_spoofing': 'liveness',
+        'liveness': 'liveness'
+    }
+
+    def __init__(self, registry: ModelRegistry, analysis_workers: Optional[int] = None):
+        """Wrap a model registry.
+        
+        Args:
+            registry: Registry building the services
+            analysis_workers: Threads fanning one frame out to several
+                models, default ``AI_ANALYSIS_WORKERS`` or 4
+        """
+        self.registry = registry
+        self.analysis_workers = analysis_workers or int(os.environ.get('AI_ANALYSIS_WORKERS', 4))
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._executor = None
+        self.feature_store = self._load_feature_store()
+
+    def _load_feature_store(self):
+        """Online attendance features from ``AI_FEATURE_STORE``, if set."""
+        path = os.environ.get('AI_FEATURE_STORE')
+        if not path:
+            return None
+        try:
+            from attendance_feature_store import AttendanceFeatureStore
+            return AttendanceFeatureStore.load(path)
+        except Exception as e:
+            logger.error(f"Error loading feature store: {str(e)}")
+            return None
+
+    @contextmanager
+    def use(self, name: str) -> Iterator:
+        """Service ``name``, held under its lock if it is in ``LOCKED_SERVICES``."""
+        service = self.registry.get(name)
+        if name not in self.LOCKED_SERVICES:
+            yield service
+            return
+        with self._locks_lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            yield service
+
+    def is_ready(self, name: str) -> bool:
+        return self.registry.is_ready([name])
+
+    def frame(self, image_data: str) -> FrameContext:
+        """Decode an uploaded image into a frame sharing one detection pass."""
+        return FrameContext(decode_image(image_data), _LockedDetector(self))
+
+    def recognize(self, frame: FrameContext) -> Dict:
+        """Identify the frame's face against the enrolled gallery."""
+        aligned = frame.aligned_face
+        if aligned is None:
+            return {'success': False, 'error': "No valid face detected"}
+        with self.use('face_recognition') as service:
+            return service.recognize_aligned_face(aligned)
+
+    def detect_emotion(self, frame: FrameContext) -> Dict:
+        """Classify the emotion of the frame's face."""
+        aligned = frame.aligned_face
+        if aligned is None:
+            return {'success': False, 'error': "No valid face detected"}
+        with self.use('emotion_detection') as service:
+            return service.detect_emotion_aligned(aligned)
+
+    def check_liveness(self, frame: FrameContext) -> Tuple[bool, Dict]:
+        """Run the single-frame liveness checks on the frame's face.
+        
+        Motion is left out: the detector is shared by every client, so
+        its previous frame would come from an unrelated request.
+        """
+        face_location = frame.face_location
+        if face_location is None:
+            return False, {"error": "No face detected"}
+        with self.use('liveness') as detector:
+            return detector.detect_liveness(frame.image, face_location, use_motion=False)
+
+    def check_anti_spoofing(self, frame: FrameContext) -> Dict:
+        """Score the frame's face with the anti-spoofing model alone.
+        
+        Skips the landmark-based liveness checks, which need a dlib pass
+        and a history of frames.
+        """
+        face_location = frame.face_location
+        if face_location is None:
+            return {'success': False, 'error': "No face detected"}
+        top, right, bottom, left = face_location
+        face_region = cv2.cvtColor(frame.image[top:bottom, left:right], cv2.COLOR_BGR2RGB)
+        with self.use('liveness') as detector:
+            if detector.anti_spoofing_model is None:
+                return {'success': False, 'error': "Anti-spoofing model is not loaded"}
+            score = detector.check_anti_spoofing(face_region)
+            threshold = detector.config.confidence_threshold
+        return {'success': True, 'is_live': score > threshold, 'score': score}
+
+    def analyze_frame(self, frame: FrameContext, analyses: List[str]) -> Dict[str, Dict]:
+        """Run several analyses on one frame concurrently.
+        
+        The frame is detected and aligned once, up front; the shared crop
+        and face box then go to each model on its own thread, so the
+        embedding, emotion and anti-spoofing models overlap instead of
+        running back to back.
+        
+        Args:
+            frame: Decoded frame
+            analyses: Names from ``FRAME_ANALYSES``
+        
+        Returns:
+            Result per analysis, each with ``success`` and ``ms``
+        
+        Raises:
+            ModelNotReady: If a service an analysis needs is not loaded
+        """
+        # Fail the whole request early rather than returning partial results
+        for name in analyses:
+            self.registry.get(self.FRAME_ANALYSES[name])
+        
+        # Detect and align once, before the fan-out
+        frame.aligned_face
+        
+        runners = {
+            'identity': self._identity_result,
+            'emotion': self.detect_emotion,
+            'anti_spoofing': self.check_anti_spoofing,
+            'liveness': self._liveness_result
+        }
+        
+        def run(name: str) -> Dict:
+            started = time.perf_counter()
+            with span(f'frame.{name}'):
+                result = runners[name](frame)
+            return {**result, 'ms': (time.perf_counter() - started) * 1000.0}
+        
+        analyses = list(dict.fromkeys(analyses))
+        if len(analyses) == 1:
+            return {analyses[0]: run(analyses[0])}
+        
+        # Copy the context so per-request stage collection sees worker spans
+        executor = self._analysis_executor()
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, run, name)
+            for name in analyses
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def _identity_result(self, frame: FrameContext) -> Dict:
+        # The enrolled user's database record stays out of the response
+        result = self.recognize(frame)
+        if not result['success']:
+            return result
+        identity = {'success': True, 'recognized': bool(result['recognized']),
+                    'confidence': float(result['confidence'])}
+        if result['recognized']:
+            identity.update(user_id=result['user_id'], face_id=result['face_id'])
+        return identity
+
+    def _liveness_result(self, frame: FrameContext) -> Dict:
+        is_live, details = self.check_liveness(frame)
+        if 'error' in details:
+            return {'success': False, 'is_live': False, 'error': details['error']}
+        scores = {name: float(score) for name, score in details['scores'].items()}
+        return {'success': True, 'is_live': bool(is_live), 'scores': scores,
+                'skipped_checks': details['skipped_checks']}
+
+    def _analysis_executor(self) -> ThreadPoolExecutor:
+        with self._locks_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.analysis_workers, thread_name_prefix='frame-analysis'
+                )
+            return self._executor
+
+    def analyze_sentiment(self, text: str) -> Dict:
+        """Lexicon polarity and subjectivity, plus the transformer label when loaded."""
+        with self.use('sentiment') as analyzer:
+            result = analyzer.analyze_sentiment(text)
+        if not result['success']:
+            return result
+        
+        sentiment = result['sentiments']
+        response = {
+            'success': True,
+            'sentiment': sentiment['label'],
+            'polarity': sentiment['polarity'],
+            'subjectivity': sentiment['subjectivity']
+        }
+        if self.is_ready('nlp'):
+            with self.use('nlp') as nlp:
+                model_result = nlp.analyze_sentiment(text)
+            if model_result['success']:
+                response['model_sentiment'] = model_result['sentiment']
+                response['model_confidence'] = model_result['confidence']
+        return response
+
+    def predict_attendance(self, record: Dict) -> float:
+        """Attendance probability for one raw feature record."""
+        with self.use('attendance_prediction') as model:
+            return float(model.predict_fast(record, self.feature_store)[0])
+
+class _LockedDetector:
+    """``FacePreprocessor`` facade serializing calls into the shared MediaPipe graph."""
+
+    def __init__(self, container: ServiceContainer):
+        self.container = container
+
+    def detect_faces(self, image: np.ndarray) -> List[Dict]:
+        with self.container.use('face_detection') as detector:
+            return detector.detect_faces(image)
+
+    def __getattr__(self, name: str):
+        # Cropping and alignment are stateless and need no lock
+        return getattr(self.container.registry.get('face_detection'), name)
+
+if __name__ == "__main__":
+    # Detect once and reuse the detection for the crop and the liveness box
+    from preprocess.facePreprocess import FacePreprocessor, PreprocessConfig
+    
+    registry = ModelRegistry()
+    registry.register('face_detection', lambda: FacePreprocessor(PreprocessConfig(normalize=False)))
+    registry.load_all()
+    container = ServiceContainer(registry)
+    
+    image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', image)
+    frame = container.frame(base64.b64encode(encoded.tobytes()).decode('ascii'))
+    print("faces:", len(frame.faces))
+    print("face location:", frame.face_location)
+    print("aligned crop:", None if frame.aligned_face is None else frame.aligned_face.shape)
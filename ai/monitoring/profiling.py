@@ -0,0 +1,410 @@
+import logging
+import glob
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Import local modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from monitoring.tracing import tracer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Request being profiled in the current context, set by ``RequestProfiler.start``
+_active_request: ContextVar[Optional['_Request']] = ContextVar('active_request', default=None)
+
+@dataclass
+class ProfilingConfig:
+    """Configuration for per-request profiling."""
+    enabled: bool = False
+    sample_rate: float = 0.01  # fraction of requests profiled from their start
+    slow_threshold_ms: float = 1000.0  # requests slower than this are always captured
+    slow_profile_after: float = 0.5  # start sampling a running request at this fraction of the threshold
+    interval_ms: float = 5.0  # stack sampling interval
+    max_stack_depth: int = 64
+    max_stacks: int = 200  # distinct stacks kept per capture
+    capture_dir: str = "cache/profiles"
+    max_captures: int = 200  # ring buffer slots on disk
+
+    @classmethod
+    def from_env(cls) -> 'ProfilingConfig':
+        """Read ``AI_PROFILE_*`` environment variables over the defaults."""
+        config = cls()
+        env = os.environ
+        config.enabled = env.get('AI_PROFILE', '0').lower() in ('1', 'true', 'yes')
+        config.sample_rate = float(env.get('AI_PROFILE_SAMPLE_RATE', config.sample_rate))
+        config.slow_threshold_ms = float(env.get('AI_PROFILE_SLOW_MS', config.slow_threshold_ms))
+        config.interval_ms = float(env.get('AI_PROFILE_INTERVAL_MS', config.interval_ms))
+        config.capture_dir = env.get('AI_PROFILE_DIR', config.capture_dir)
+        config.max_captures = int(env.get('AI_PROFILE_MAX_CAPTURES', config.max_captures))
+        return config
+
+class _Session:
+    """Folded-stack counts for one profiled thread."""
+    
+    __slots__ = ('thread_id', 'counts', 'samples', 'started')
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.counts = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+
+class StackSampler:
+    """Statistical CPU profiler sampling the stacks of selected threads.
+    
+    A daemon thread wakes every ``interval`` seconds while any session is
+    active and folds each watched thread's stack into a
+    ``root;...;leaf`` key, the format flame graph tools read.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._sessions: Dict[int, _Session] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id: int) -> _Session:
+        session = _Session(thread_id)
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return session
+
+    def stop(self, session: _Session) -> _Session:
+        with self._lock:
+            self._sessions.pop(id(session), None)
+        return session
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions.values())
+            if not sessions:
+                # Idle until the next session starts
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is None or session.thread_id == own_id:
+                    continue
+                session.counts[self._fold(frame)] += 1
+                session.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _fold(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+class CaptureStore:
+    """Bounded on-disk ring buffer of request captures.
+    
+    Capture ``n`` is written to slot ``n % max_captures``, so the
+    directory never holds more than ``max_captures`` files and the oldest
+    capture is overwritten first.
+    """
+
+    def __init__(self, directory: str, max_captures: int = 200):
+        self.directory = directory
+        self.max_captures = max(1, max_captures)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        
+        # Continue numbering after captures left by earlier runs
+        existing = [capture['id'] for capture in self._read_all()]
+        self._counter = itertools.count(max(existing, default=-1) + 1)
+
+    def _slot_path(self, capture_id: int) -> str:
+        return os.path.join(self.directory, f"slot-{capture_id % self.max_captures:05d}.json")
+
+    def add(self, capture: Dict) -> int:
+        with self._lock:
+            capture_id = next(self._counter)
+            capture = {'id': capture_id, **capture}
+            path = self._slot_path(capture_id)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(capture, f)
+            os.replace(tmp_path, path)
+        return capture_id
+
+    def get(self, capture_id: int) -> Optional[Dict]:
+        try:
+            with open(self._slot_path(capture_id), 'r') as f:
+                capture = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # The slot may have been reused by a newer capture
+        return capture if capture.get('id') == capture_id else None
+
+    def list(self, limit: Optional[int] = None) -> List[Dict]:
+        """Capture summaries, newest first, without the profile stacks."""
+        summaries = [
+            {key: value for key, value in capture.items() if key != 'profile'}
+            for capture in self._read_all()
+        ]
+        summaries.sort(key=lambda capture: capture['id'], reverse=True)
+        return summaries[:limit] if limit else summaries
+
+    def clear(self):
+        with self._lock:
+            for path in glob.glob(os.path.join(self.directory, 'slot-*.json')):
+                os.remove(path)
+
+    def _read_all(self) -> List[Dict]:
+        captures = []
+        for path in glob.glob(os.path.join(self.directory, 'slot-*.json')):
+            try:
+                with open(path, 'r') as f:
+                    captures.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return captures
+
+class _Request:
+    __slots__ = ('method', 'path', 'thread_id', 'started', 'session', 'reason')
+
+    def __init__(self, method: str, path: str, thread_id: int):
+        self.method = method
+        self.path = path
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.session = None
+        self.reason = None
+
+class RequestProfiler:
+    """Samples a fraction of requests and captures every slow one.
+    
+    Sampled requests are profiled from their start. Other requests are
+    only tracked in an in-flight table; a watchdog thread starts
+    profiling any that run past ``slow_profile_after`` of the slow
+    threshold, so unsampled fast requests pay a dict insert and delete.
+    Captures hold the stage timings and folded stacks and go to a
+    ``CaptureStore``.
+    """
+
+    def __init__(self, config: Optional[ProfilingConfig] = None):
+        self.config = config or ProfilingConfig()
+        self.sampler = StackSampler(self.config.interval_ms / 1000.0, self.config.max_stack_depth)
+        self.store = CaptureStore(self.config.capture_dir, self.config.max_captures) if self.config.enabled else None
+        self._in_flight: Dict[int, _Request] = {}
+        self._lock = threading.Lock()
+        self._watchdog = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def start(self, method: str, path: str) -> _Request:
+        """Register a request on the current thread."""
+        request = _Request(method, path, threading.get_ident())
+        if random.random() < self.config.sample_rate:
+            request.reason = 'sampled'
+            request.session = self.sampler.start(request.thread_id)
+        with self._lock:
+            self._in_flight[id(request)] = request
+        _active_request.set(request)
+        if self._watchdog is None:
+            self._start_watchdog()
+        return request
+
+    def on_worker_thread(self, fn: Callable) -> Callable:
+        """Decorator for code a request runs on another thread.
+        
+        Sync FastAPI endpoints run on threadpool workers, not on the
+        event-loop thread that ``start`` saw. While the wrapped function
+        runs, the request's profile samples the worker thread instead;
+        the context holding the request must be copied to the worker,
+        as ``run_in_threadpool`` does.
+        """
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            request = _active_request.get()
+            if request is None:
+                return fn(*args, **kwargs)
+            previous = self._move(request, threading.get_ident())
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._move(request, previous)
+        return wrapper
+
+    def _move(self, request: _Request, thread_id: int) -> int:
+        """Point a request and its sampling session at ``thread_id``."""
+        with self._lock:
+            previous = request.thread_id
+            request.thread_id = thread_id
+            if request.session is not None:
+                request.session.thread_id = thread_id
+        return previous
+
+    def finish(self, request: _Request, status: int,
+               stages: Optional[List[Tuple[str, float]]] = None) -> Optional[int]:
+        """Unregister a request and store a capture if it was sampled or slow.
+        
+        Returns:
+            Capture id, or None when nothing was stored
+        """
+        duration_ms = (time.perf_counter() - request.started) * 1000.0
+        if _active_request.get() is request:
+            _active_request.set(None)
+        with self._lock:
+            self._in_flight.pop(id(request), None)
+            session = request.session
+        if session is not None:
+            self.sampler.stop(session)
+        
+        slow = duration_ms >= self.config.slow_threshold_ms
+        if request.reason != 'sampled' and not slow:
+            return None
+        
+        try:
+            return self.store.add(self._capture(request, status, duration_ms, slow, session, stages or []))
+        except Exception as e:
+            logger.error(f"Error storing request profile: {str(e)}")
+            return None
+
+    def _capture(self, request: _Request, status: int, duration_ms: float, slow: bool,
+                 session: Optional[_Session], stages: List[Tuple[str, float]]) -> Dict:
+        stage_totals = {}
+        for name, seconds in stages:
+            stage_totals[name] = stage_totals.get(name, 0.0) + seconds * 1000.0
+        
+        profile = None
+        if session is not None:
+            profile = {
+                'interval_ms': self.config.interval_ms,
+                'samples': session.samples,
+                'started_after_ms': (session.started - request.started) * 1000.0,
+                'stacks': [
+                    {'stack': stack, 'count': count}
+                    for stack, count in session.counts.most_common(self.config.max_stacks)
+                ]
+            }
+        
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'status': status,
+            'duration_ms': duration_ms,
+            'reason': 'slow' if slow else request.reason,
+            'stages': [{'stage': name, 'ms': seconds * 1000.0} for name, seconds in stages],
+            'stage_totals_ms': stage_totals,
+            'profile': profile
+        }
+
+    def _start_watchdog(self):
+        with self._lock:
+            if self._watchdog is not None:
+                return
+            self._watchdog = threading.Thread(target=self._watch, name='slow-request-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def _watch(self):
+        """Start profiling requests that are on track to be slow."""
+        after = self.config.slow_threshold_ms * self.config.slow_profile_after / 1000.0
+        poll = min(max(after / 4, 0.01), 0.1)
+        while True:
+            time.sleep(poll)
+            now = time.perf_counter()
+            with self._lock:
+                for request in self._in_flight.values():
+                    if request.session is None and now - request.started >= after:
+                        request.session = self.sampler.start(request.thread_id)
+
+class ProfilingMiddleware:
+    """ASGI middleware feeding every HTTP request through a ``RequestProfiler``.
+    
+    Stage timings recorded by the shared tracer during the request are
+    attached to its capture. Add it only while profiling is enabled.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        handle = self.profiler.start(scope['method'], scope['path'])
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        with tracer.collect() as stages:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                self.profiler.finish(handle, status, stages)
+
+def to_collapsed(capture: Dict) -> str:
+    """Profile stacks of a capture in collapsed format for flame graph tools."""
+    profile = capture.get('profile') or {}
+    return ''.join(f"{entry['stack']} {entry['count']}\n" for entry in profile.get('stacks', []))
+
+if __name__ == "__main__":
+    # Profile one fast and one slow call in-process
+    profiler = RequestProfiler(ProfilingConfig(
+        enabled=True, sample_rate=0.0, slow_threshold_ms=200.0, capture_dir="cache/profiles_demo"
+    ))
+
+    def busy(seconds: float):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            sum(i * i for i in range(1000))
+    
+    for path, seconds in (("/fast", 0.01), ("/slow", 0.4)):
+        request = profiler.start("GET", path)
+        busy(seconds)
+        print(path, "capture:", profiler.finish(request, 200))
+    
+    latest = profiler.store.list(limit=1)[0]
+    print(json.dumps(latest, indent=2))
+    print(to_collapsed(profiler.store.get(latest['id'])))
+
+    # A slow request whose work runs on a worker thread, like a sync endpoint
+    import contextvars
+    request = profiler.start("GET", "/threaded")
+    worker = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(profiler.on_worker_thread(busy), 0.4)
+    )
+    worker.start()
+    worker.join()
+    capture = profiler.store.get(profiler.finish(request, 200))
+    assert any('profiling.py:busy' in entry['stack'] for entry in capture['profile']['stacks']), \
+        "worker-thread capture is missing the handler's frames"
+    print("/threaded capture includes the worker thread's frames")
@@ -0,0 +1,52 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+from typing import Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def measure_cold_start(import_statement: str, construct_statement: str,
+                       path: Optional[str] = None, runs: int = 3) -> Dict:
+    """Time importing and constructing an object in fresh interpreters.
+    
+    Args:
+        import_statement: Code performing the imports
+        construct_statement: Code constructing the object. A JSON-serializable
+            value it assigns to ``result`` is returned with each run.
+        path: Directory put first on ``sys.path``
+        runs: Interpreters to start; the median run is reported
+        
+    Returns:
+        Median import, construction and total seconds, plus each run
+        
+    Raises:
+        RuntimeError: If an interpreter exits with an error
+    """
+    script = "\n".join([
+        "import json, sys, time",
+        f"sys.path.insert(0, {path or os.getcwd()!r})",
+        "result = None",
+        "start = time.perf_counter()",
+        import_statement,
+        "imported = time.perf_counter()",
+        construct_statement,
+        "done = time.perf_counter()",
+        "timings = {'import_seconds': imported - start, "
+        "'construct_seconds': done - imported, 'total_seconds': done - start}",
+        "print(json.dumps(timings if result is None else {**timings, 'result': result}))"
+    ])
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(
+                f"Cold start run exited with {completed.returncode}: {completed.stderr.strip()[-2000:]}"
+            )
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    
+    samples.sort(key=lambda sample: sample['total_seconds'])
+    return {**samples[len(samples) // 2], 'runs': samples}
@@ -0,0 +1,278 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the batch-size buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# Per-request stage timings, set by ``Tracer.collect``
+_collected_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('collected_stages', default=None)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition model."""
+    
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': self.total, 'count': self.count}
+
+class _Span:
+    """Times one stage and records it on exit."""
+    
+    __slots__ = ('tracer', 'name', 'started')
+
+    def __init__(self, tracer: 'Tracer', name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.observe(self.name, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+class _NullSpan:
+    """Shared no-op span returned while tracing is disabled."""
+    
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Process-wide stage timings, model-call counts and batch sizes.
+    
+    Spans are context managers (``with tracer.span('face.detect'):``) or
+    decorators (``@traced('face.detect')``). While disabled a span is a
+    shared no-op object, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._model_calls: Dict[str, int] = {}
+        self._batch_sizes: Dict[str, Histogram] = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str):
+        """Context manager timing the stage ``name``."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        """Record a stage duration measured elsewhere."""
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+        stages = _collected_stages.get()
+        if stages is not None:
+            stages.append((name, seconds))
+
+    def record_model_call(self, model: str, batch_size: int = 1):
+        """Count one inference call of ``model`` on ``batch_size`` inputs."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._model_calls[model] = self._model_calls.get(model, 0) + 1
+            histogram = self._batch_sizes.get(model)
+            if histogram is None:
+                histogram = self._batch_sizes[model] = Histogram(BATCH_SIZE_BUCKETS)
+            histogram.observe(batch_size)
+
+    @contextmanager
+    def collect(self) -> Iterator[List[Tuple[str, float]]]:
+        """Gather ``(stage, seconds)`` for spans finished in this context.
+        
+        Used to attach a per-stage breakdown to a single request.
+        """
+        stages = []
+        token = _collected_stages.set(stages)
+        try:
+            yield stages
+        finally:
+            _collected_stages.reset(token)
+
+    def snapshot(self) -> Dict:
+        """Copy of all metrics as plain data."""
+        with self._lock:
+            return {
+                'stages': {name: histogram.snapshot() for name, histogram in self._stages.items()},
+                'stage_errors': dict(self._errors),
+                'model_calls': dict(self._model_calls),
+                'batch_sizes': {name: histogram.snapshot() for name, histogram in self._batch_sizes.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._errors.clear()
+            self._model_calls.clear()
+            self._batch_sizes.clear()
+
+    def render_prometheus(self, prefix: str = 'ai') -> str:
+        """Metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        
+        lines.append(f"# HELP {prefix}_stage_duration_seconds Time spent in each instrumented stage")
+        lines.append(f"# TYPE {prefix}_stage_duration_seconds histogram")
+        for name, histogram in sorted(snapshot['stages'].items()):
+            lines.extend(_histogram_lines(f"{prefix}_stage_duration_seconds", {'stage': name}, histogram))
+        
+        lines.append(f"# HELP {prefix}_stage_errors_total Stages that raised an exception")
+        lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+        for name, count in sorted(snapshot['stage_errors'].items()):
+            lines.append(f"{prefix}_stage_errors_total{_labels({'stage': name})} {count}")
+        
+        lines.append(f"# HELP {prefix}_model_calls_total Model inference calls")
+        lines.append(f"# TYPE {prefix}_model_calls_total counter")
+        for name, count in sorted(snapshot['model_calls'].items()):
+            lines.append(f"{prefix}_model_calls_total{_labels({'model': name})} {count}")
+        
+        lines.append(f"# HELP {prefix}_model_batch_size Inputs per model inference call")
+        lines.append(f"# TYPE {prefix}_model_batch_size histogram")
+        for name, histogram in sorted(snapshot['batch_sizes'].items()):
+            lines.extend(_histogram_lines(f"{prefix}_model_batch_size", {'model': name}, histogram))
+        
+        return '\n'.join(lines) + '\n'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels: Dict[str, str]) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _histogram_lines(metric: str, labels: Dict[str, str], histogram: Dict) -> List[str]:
+    lines = []
+    for bound, count in histogram['buckets']:
+        le = '+Inf' if bound == float('inf') else repr(float(bound))
+        lines.append(f"{metric}_bucket{_labels({**labels, 'le': le})} {count}")
+    lines.append(f"{metric}_sum{_labels(labels)} {histogram['sum']}")
+    lines.append(f"{metric}_count{_labels(labels)} {histogram['count']}")
+    return lines
+
+# Shared tracer; set AI_TRACING=1 to enable it at import
+tracer = Tracer(enabled=os.environ.get('AI_TRACING', '0').lower() in ('1', 'true', 'yes'))
+
+def span(name: str):
+    """Span on the shared tracer."""
+    return tracer.span(name)
+
+def traced(name: str) -> Callable:
+    """Decorator timing every call of the wrapped function as stage ``name``."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with _Span(tracer, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_model_call(model: str, batch_size: int = 1):
+    """Model-call counter on the shared tracer."""
+    tracer.record_model_call(model, batch_size)
+
+class TracingMiddleware:
+    """ASGI middleware observing each request as stage ``http <method> <route>``.
+    
+    Written against raw ASGI rather than ``BaseHTTPMiddleware``, which
+    adds a task and a response stream per request; while the tracer is
+    disabled a request costs one flag check.
+    """
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template so ids in paths don't explode the label set
+            path = getattr(scope.get('route'), 'path', 'unmatched')
+            self.tracer.observe(f"http {scope['method']} {path}", time.perf_counter() - started,
+                                error=status >= 500)
+
+if __name__ == "__main__":
+    # Compare the cost of a disabled span with a bare call
+    def work():
+        return None
+    
+    traced_work = traced('demo.work')(work)
+    n = 1_000_000
+    for enabled in (False, True):
+        tracer.enabled = enabled
+        started = time.perf_counter()
+        for _ in range(n):
+            traced_work()
+        traced_ns = (time.perf_counter() - started) / n * 1e9
+        started = time.perf_counter()
+        for _ in range(n):
+            work()
+        bare_ns = (time.perf_counter() - started) / n * 1e9
+        print(f"enabled={enabled}: {traced_ns - bare_ns:.0f} ns overhead per call")
+    
+    print(tracer.render_prometheus())
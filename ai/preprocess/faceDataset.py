@@ -0,0 +1,368 @@
+import cv2
+import numpy as np
+import tensorflow as tf
+import logging
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import hashlib
+import math
+import os
+import random
+
+# Import local modules
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocess.facePreprocess import FacePreprocessor, PreprocessConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+@dataclass
+class FaceDatasetConfig:
+    """Configuration for streaming face training datasets."""
+    target_size: Tuple[int, int] = (224, 224)
+    grayscale: bool = False
+    align: bool = True
+    normalize: bool = True
+    cache_dir: str = "cache/face_crops"
+    batch_size: int = 32
+    shuffle_buffer: int = 2048  # decoded crops held for shuffling
+    augment: bool = True
+    rotation_range: float = 15.0  # max rotation in degrees
+    brightness_range: Tuple[float, float] = (0.8, 1.2)
+    workers: Optional[int] = None  # crop processes, defaults to the CPU count
+    shard_size: int = 1024  # crops per exported shard
+
+class FaceDatasetBuilder:
+    """Builds tf.data pipelines that stream face crops from disk.
+    
+    Detection and alignment run once per image in a process pool and the
+    aligned uint8 crops are cached as ``.npy`` files, so later epochs and
+    runs only read crops. Batches are augmented with vectorized TensorFlow
+    ops and prefetched, and nothing requires the dataset to fit in RAM.
+    """
+
+    def __init__(self, config: Optional[FaceDatasetConfig] = None,
+                 preprocess_config: Optional[PreprocessConfig] = None):
+        self.config = config or FaceDatasetConfig()
+        self.preprocess_config = preprocess_config or PreprocessConfig(
+            target_size=self.config.target_size,
+            normalize=False
+        )
+        os.makedirs(self.config.cache_dir, exist_ok=True)
+
+    @property
+    def crop_shape(self) -> Tuple[int, int, int]:
+        width, height = self.config.target_size
+        return (height, width, 1 if self.config.grayscale else 3)
+
+    def _cache_path(self, image_path: str) -> str:
+        """Crop cache file for an image, invalidated when the file changes."""
+        stat = os.stat(image_path)
+        key = "|".join(str(part) for part in (
+            os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size,
+            self.config.target_size, self.config.align, self.config.grayscale,
+            self.preprocess_config.face_confidence
+        ))
+        return os.path.join(self.config.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+
+    def cache_crops(self, image_paths: Sequence[str]) -> List[Optional[str]]:
+        """Detect, align and cache a crop for every image not cached yet.
+        
+        Args:
+            image_paths: Image files
+        
+        Returns:
+            Cached crop path per image, None where no face was found
+        """
+        cache_paths = [self._cache_path(path) for path in image_paths]
+        todo = [
+            (image_path, cache_path)
+            for image_path, cache_path in zip(image_paths, cache_paths)
+            if not os.path.exists(cache_path) and not os.path.exists(cache_path + '.miss')
+        ]
+        
+        if todo:
+            logger.info(f"Caching {len(todo)} face crops ({len(image_paths) - len(todo)} cached)")
+            workers = self.config.workers or os.cpu_count() or 1
+            initargs = (self.preprocess_config, self.config.align, self.config.grayscale)
+            if workers == 1:
+                _init_crop_worker(*initargs)
+                for image_path, cache_path in todo:
+                    _crop_to_cache(image_path, cache_path)
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_crop_worker,
+                    initargs=initargs
+                ) as executor:
+                    chunksize = max(1, len(todo) // (workers * 8))
+                    list(executor.map(_crop_to_cache, *zip(*todo), chunksize=chunksize))
+        
+        return [path if os.path.exists(path) else None for path in cache_paths]
+
+    def build(self, image_paths: Sequence[str], labels: Sequence[int],
+              training: bool = True, num_classes: Optional[int] = None) -> tf.data.Dataset:
+        """Streaming dataset of (image batch, label batch) from image files.
+        
+        Args:
+            image_paths: Image files
+            labels: Integer label per image
+            training: Shuffle and augment
+            num_classes: One-hot encode labels to this depth
+        
+        Returns:
+            Batched, prefetched ``tf.data.Dataset``
+        """
+        crops = self.cache_crops(image_paths)
+        pairs = [(crop, label) for crop, label in zip(crops, labels) if crop is not None]
+        if len(pairs) < len(crops):
+            logger.warning(f"Skipping {len(crops) - len(pairs)} images without a detectable face")
+        if not pairs:
+            raise ValueError("No valid faces for training")
+        
+        crop_paths, crop_labels = zip(*pairs)
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (list(crop_paths), np.asarray(crop_labels, dtype=np.int64))
+        )
+        if training:
+            # Shuffling paths is cheap, so shuffle the whole epoch
+            dataset = dataset.shuffle(len(crop_paths), reshuffle_each_iteration=True)
+        dataset = dataset.map(self._load_crop, num_parallel_calls=AUTOTUNE, deterministic=not training)
+        return self._finish(dataset, training, num_classes, shuffle=False)
+
+    def _load_crop(self, path, label):
+        crop = tf.numpy_function(lambda p: np.load(p.decode('utf-8')), [path], tf.uint8)
+        crop.set_shape(self.crop_shape)
+        return crop, label
+
+    def _finish(self, dataset: tf.data.Dataset, training: bool,
+                num_classes: Optional[int], shuffle: bool = True) -> tf.data.Dataset:
+        """Shuffle, batch, augment, normalize and prefetch decoded crops."""
+        if training and shuffle:
+            dataset = dataset.shuffle(self.config.shuffle_buffer, reshuffle_each_iteration=True)
+        dataset = dataset.batch(self.config.batch_size, drop_remainder=False)
+        
+        def prepare(images, labels):
+            images = tf.cast(images, tf.float32)
+            if training and self.config.augment:
+                images = self.augment_batch(images)
+            if self.config.normalize:
+                images = images / 255.0
+            if num_classes:
+                labels = tf.one_hot(labels, num_classes)
+            return images, labels
+        
+        dataset = dataset.map(prepare, num_parallel_calls=AUTOTUNE, deterministic=not training)
+        if training:
+            options = tf.data.Options()
+            options.deterministic = False
+            dataset = dataset.with_options(options)
+        return dataset.prefetch(AUTOTUNE)
+
+    def augment_batch(self, images: tf.Tensor) -> tf.Tensor:
+        """Random flip, rotation and brightness for a float batch in [0, 255].
+        
+        Vectorized counterpart of ``FacePreprocessor.augment_face``: one
+        random draw per image instead of a fixed list of variants.
+        """
+        batch = tf.shape(images)[0]
+        height = tf.cast(tf.shape(images)[1], tf.float32)
+        width = tf.cast(tf.shape(images)[2], tf.float32)
+        
+        # Horizontal flip
+        flip = tf.random.uniform([batch, 1, 1, 1]) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[2]), images)
+        
+        # Rotation about the image center
+        max_angle = self.config.rotation_range * math.pi / 180.0
+        angles = tf.random.uniform([batch], -max_angle, max_angle)
+        cos, sin = tf.cos(angles), tf.sin(angles)
+        x_offset = ((width - 1) - (cos * (width - 1) - sin * (height - 1))) / 2.0
+        y_offset = ((height - 1) - (sin * (width - 1) + cos * (height - 1))) / 2.0
+        zeros = tf.zeros_like(angles)
+        transforms = tf.stack([cos, -sin, x_offset, sin, cos, y_offset, zeros, zeros], axis=1)
+        images = tf.raw_ops.ImageProjectiveTransformV3(
+            images=images,
+            transforms=transforms,
+            output_shape=tf.shape(images)[1:3],
+            fill_value=0.0,
+            interpolation="BILINEAR",
+            fill_mode="CONSTANT"
+        )
+        
+        # Brightness scaling, as cv2.convertScaleAbs(alpha=...)
+        low, high = self.config.brightness_range
+        alpha = tf.random.uniform([batch, 1, 1, 1], low, high)
+        return tf.clip_by_value(images * alpha, 0.0, 255.0)
+
+    def export_shards(self, image_paths: Sequence[str], labels: Sequence[int],
+                      output_dir: str, fmt: str = "tfrecord") -> List[str]:
+        """Write cached crops and labels as fixed-size shards.
+        
+        Args:
+            image_paths: Image files
+            labels: Integer label per image
+            output_dir: Shard directory
+            fmt: ``"tfrecord"`` or ``"npy"``
+        
+        Returns:
+            Paths of the written shards
+        """
+        if fmt not in ("tfrecord", "npy"):
+            raise ValueError(f"Unknown shard format: {fmt}")
+        os.makedirs(output_dir, exist_ok=True)
+        
+        crops = self.cache_crops(image_paths)
+        pairs = [(crop, label) for crop, label in zip(crops, labels) if crop is not None]
+        n_shards = max(1, math.ceil(len(pairs) / self.config.shard_size))
+        
+        shard_paths = []
+        for index in range(n_shards):
+            shard = pairs[index * self.config.shard_size:(index + 1) * self.config.shard_size]
+            name = os.path.join(output_dir, f"shard-{index:05d}-of-{n_shards:05d}")
+            if fmt == "tfrecord":
+                path = f"{name}.tfrecord"
+                with tf.io.TFRecordWriter(path) as writer:
+                    for crop_path, label in shard:
+                        writer.write(_crop_example(np.load(crop_path), label))
+            else:
+                path = f"{name}.npz"
+                np.savez(
+                    path,
+                    images=np.stack([np.load(crop_path) for crop_path, _ in shard]),
+                    labels=np.asarray([label for _, label in shard], dtype=np.int64)
+                )
+            shard_paths.append(path)
+        
+        logger.info(f"Exported {len(pairs)} crops to {n_shards} {fmt} shards in {output_dir}")
+        return shard_paths
+
+    def from_shards(self, shard_dir: str, training: bool = True,
+                    num_classes: Optional[int] = None) -> tf.data.Dataset:
+        """Streaming dataset over shards written by ``export_shards``."""
+        tfrecords = sorted(glob.glob(os.path.join(shard_dir, "shard-*.tfrecord")))
+        if tfrecords:
+            files = tf.data.Dataset.from_tensor_slices(tfrecords)
+            if training:
+                files = files.shuffle(len(tfrecords), reshuffle_each_iteration=True)
+            dataset = files.interleave(
+                tf.data.TFRecordDataset,
+                cycle_length=min(len(tfrecords), 8),
+                num_parallel_calls=AUTOTUNE,
+                deterministic=not training
+            )
+            dataset = dataset.map(self._parse_example, num_parallel_calls=AUTOTUNE)
+        else:
+            npz_files = sorted(glob.glob(os.path.join(shard_dir, "shard-*.npz")))
+            if not npz_files:
+                raise FileNotFoundError(f"No shards found in {shard_dir}")
+            dataset = tf.data.Dataset.from_generator(
+                lambda: _iter_npz_shards(npz_files, shuffle=training),
+                output_signature=(
+                    tf.TensorSpec(self.crop_shape, tf.uint8),
+                    tf.TensorSpec([], tf.int64)
+                )
+            )
+        return self._finish(dataset, training, num_classes)
+
+    def _parse_example(self, serialized):
+        features = tf.io.parse_single_example(serialized, {
+            'image': tf.io.FixedLenFeature([], tf.string),
+            'label': tf.io.FixedLenFeature([], tf.int64)
+        })
+        image = tf.reshape(tf.io.decode_raw(features['image'], tf.uint8), self.crop_shape)
+        return image, features['label']
+
+def split_paths(image_paths: Sequence[str], labels: Sequence, validation_split: float = 0.2,
+                seed: int = 42) -> Tuple[Tuple[List, List], Tuple[List, List]]:
+    """Shuffle and split paths/labels into training and validation sets."""
+    order = list(range(len(image_paths)))
+    random.Random(seed).shuffle(order)
+    n_val = int(len(order) * validation_split)
+    pick = lambda indices: ([image_paths[i] for i in indices], [labels[i] for i in indices])
+    return pick(order[n_val:]), pick(order[:n_val])
+
+def encode_labels(labels: Sequence) -> Tuple[List[int], List]:
+    """Map arbitrary labels to integer indices; returns (indices, classes)."""
+    classes = sorted(set(labels))
+    index = {label: i for i, label in enumerate(classes)}
+    return [index[label] for label in labels], classes
+
+def _crop_example(crop: np.ndarray, label: int) -> bytes:
+    return tf.train.Example(features=tf.train.Features(feature={
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[crop.tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)]))
+    })).SerializeToString()
+
+def _iter_npz_shards(paths: List[str], shuffle: bool) -> Iterator[Tuple[np.ndarray, int]]:
+    """Yield crops one shard at a time, so only one shard is in memory."""
+    paths = list(paths)
+    if shuffle:
+        random.shuffle(paths)
+    for path in paths:
+        with np.load(path) as shard:
+            images, labels = shard['images'], shard['labels']
+        yield from zip(images, labels)
+
+# Per-process preprocessor for crop workers
+_worker_preprocessor = None
+_worker_options = {}
+
+def _init_crop_worker(preprocess_config: PreprocessConfig, align: bool, grayscale: bool):
+    global _worker_preprocessor, _worker_options
+    _worker_preprocessor = FacePreprocessor(preprocess_config)
+    _worker_options = {'align': align, 'grayscale': grayscale}
+
+def _crop_to_cache(image_path: str, cache_path: str) -> bool:
+    """Decode, detect, align and resize one image into the crop cache."""
+    try:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Unreadable image: {image_path}")
+        
+        # Same steps as FacePreprocessor.process_image, first face only
+        faces = _worker_preprocessor.detect_faces(image)
+        face = _worker_preprocessor.extract_face(image, faces[0]['bbox']) if faces else None
+        if face is None or face.size == 0:
+            open(cache_path + '.miss', 'w').close()
+            return False
+        if _worker_options['align'] and faces[0]['landmarks']:
+            face = _worker_preprocessor.align_face(face, faces[0]['landmarks'])
+        
+        face = cv2.resize(face, _worker_preprocessor.config.target_size)
+        if _worker_options['grayscale']:
+            face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)[..., np.newaxis]
+        
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(face, dtype=np.uint8))
+        os.replace(tmp_path, cache_path)
+        return True
+    
+    except Exception as e:
+        logger.error(f"Error caching face crop for {image_path}: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    try:
+        # Write a few dummy images and stream them through the pipeline
+        sample_dir = os.path.join("cache", "face_dataset_sample")
+        os.makedirs(sample_dir, exist_ok=True)
+        paths = []
+        for i in range(8):
+            path = os.path.join(sample_dir, f"sample_{i}.jpg")
+            cv2.imwrite(path, np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8))
+            paths.append(path)
+        
+        builder = FaceDatasetBuilder(FaceDatasetConfig(target_size=(48, 48), grayscale=True, workers=2))
+        crops = builder.cache_crops(paths)
+        print(f"Cached crops: {sum(crop is not None for crop in crops)}/{len(paths)}")
+    
+    except Exception as e:
+        logger.error(f"Error in main execution: {str(e)}")
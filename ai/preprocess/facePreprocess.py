@@ -6,6 +6,11 @@ from dataclasses import dataclass
 from typing import List, Dict, Tuple, Optional, Union
 import os
 
+# Import local modules
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from monitoring.tracing import record_model_call, traced
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -41,12 +46,14 @@ class FacePreprocessor:
         os.makedirs(self.config.cache_dir, exist_ok=True)
         logger.info("Face preprocessor initialized")
 
+    @traced('face.detect')
     def detect_faces(self, image: np.ndarray) -> List[Dict]:
         """Detect faces in an image and return their bounding boxes."""
         try:
             # Convert to RGB for MediaPipe
             rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             results = self.face_detector.process(rgb_image)
+            record_model_call('face_detector')
             
             faces = []
             if results.detections:
@@ -100,6 +107,7 @@ class FacePreprocessor:
             logger.error(f"Error extracting landmarks: {str(e)}")
             return {}
 
+    @traced('face.align')
     def align_face(self, image: np.ndarray, landmarks: Dict) -> np.ndarray:
         """Align face based on eye positions."""
         try:
@@ -130,6 +138,7 @@ class FacePreprocessor:
             logger.error(f"Error aligning face: {str(e)}")
             return image
 
+    @traced('face.extract')
     def extract_face(self, image: np.ndarray, bbox: Tuple[int, int, int, int]) -> np.ndarray:
         """Extract face region from image using bounding box."""
         try:
@@ -149,6 +158,7 @@ class FacePreprocessor:
             logger.error(f"Error extracting face: {str(e)}")
             return None
 
+    @traced('face.preprocess')
     def preprocess_face(self, face_image: np.ndarray) -> np.ndarray:
         """Preprocess face image for model input."""
         try:
@@ -203,6 +213,7 @@ class FacePreprocessor:
             logger.error(f"Error augmenting face: {str(e)}")
             return [face_image]
 
+    @traced('face.process_image')
     def process_image(self, image: np.ndarray, align: bool = True,
                      augment: bool = False) -> Dict:
         """Process an image through the complete pipeline."""
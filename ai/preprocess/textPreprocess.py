@@ -1,27 +1,84 @@
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
 import logging
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Union
+from typing import Iterable, Iterator, List, Dict, Optional, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import random
 import string
+import sys
+import time
 import numpy as np
 
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
-    nltk.download('averaged_perceptron_tagger', quiet=True)
-except Exception as e:
-    print(f"Warning: Failed to download NLTK data: {str(e)}")
+# Shared cold-start timing from the monitoring package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from monitoring.startup import measure_cold_start
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Local NLTK corpora; NLTK itself is imported on first use. The directory
+# ships empty; provision it at build time with
+# ``python ai/preprocess/textPreprocess.py --download-nltk-data``.
+NLTK_DATA_DIR = os.environ.get(
+    'NLTK_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nltk_data')
+)
+NLTK_RESOURCES = ['punkt', 'punkt_tab', 'stopwords', 'wordnet']
+
+# Seconds allowed for importing this module and constructing TextPreprocessor
+COLD_START_BUDGET_SECONDS = 1.0
+
+# Cleaning patterns, applied in this order after lowercasing
+URL_PATTERN = re.compile(r'(?:http|www)\S+')
+EMAIL_PATTERN = re.compile(r'\S+@\S+')
+
+def _synthetic_corpus(n_texts: int, seed: int = 42) -> List[str]:
+    """Feedback-like texts mixing words, URLs, emails, numbers and symbols."""
+    rng = random.Random(seed)
+    words = ['great', 'class', 'The', 'lecture', 'was', 'Too', 'fast', 'thanks',
+             'homework', 'late', 'really', 'helpful', 'confusing', 'exam', 'week']
+    extras = ['https://example.com/a?b=1', 'www.school.edu', 'student@example.com',
+              '2024', '3rd', '!!!', '...', '@teacher', '#feedback', '$5', '(ok)',
+              "don't", 'e-mail', '\u0663\u0664', '--', 'A+']
+    return [
+        ' '.join(rng.choice(extras) if rng.random() < 0.2 else rng.choice(words)
+                 for _ in range(rng.randint(5, 40)))
+        for _ in range(n_texts)
+    ]
+
+def _load_nltk(data_dir: str):
+    """Import NLTK with ``data_dir`` searched first for corpora."""
+    import nltk
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    return nltk
+
+def _missing_nltk_resource(resource: str, data_dir: str) -> LookupError:
+    """Error for a corpus the preprocessor needs but cannot find."""
+    return LookupError(
+        f"NLTK resource '{resource}' not found in {data_dir}; run "
+        f"'python ai/preprocess/textPreprocess.py --download-nltk-data' "
+        f"or point NLTK_DATA_DIR at a provisioned directory"
+    )
+
+def download_nltk_data(data_dir: str = NLTK_DATA_DIR,
+                       resources: Optional[List[str]] = None) -> str:
+    """Fetch the NLTK corpora the preprocessor uses into ``data_dir``.
+    
+    Meant for image builds and provisioning; nothing is downloaded at runtime.
+    """
+    nltk = _load_nltk(data_dir)
+    os.makedirs(data_dir, exist_ok=True)
+    for resource in resources or NLTK_RESOURCES:
+        if not nltk.download(resource, download_dir=data_dir, quiet=True):
+            raise RuntimeError(f"Failed to download NLTK resource: {resource}")
+    logger.info(f"NLTK data downloaded to {data_dir}")
+    return data_dir
+
 @dataclass
 class PreprocessConfig:
     """Configuration for text preprocessing."""
@@ -34,46 +91,134 @@ class PreprocessConfig:
     max_sequence_length: int = 100
     custom_stopwords: List[str] = field(default_factory=list)
     keep_special_chars: List[str] = field(default_factory=lambda: ['@', '#', '$'])
+    nltk_data_dir: str = NLTK_DATA_DIR
+    lemma_cache_size: int = 200000  # memoized lemmas before the cache is reset
 
 class TextPreprocessor:
     def __init__(self, config: Optional[PreprocessConfig] = None):
-        """Initialize text preprocessor."""
+        """Initialize text preprocessor.
+        
+        NLTK resources load on first use, so construction is cheap.
+        """
         self.config = config or PreprocessConfig()
-        self.lemmatizer = WordNetLemmatizer()
-        self.stopwords = set(stopwords.words('english'))
-        if self.config.custom_stopwords:
-            self.stopwords.update(self.config.custom_stopwords)
+        self._lemmatizer = None
+        self._stopwords = None
+        self._word_tokenize = None
+        self._cleaners = None
+        self._lemma_cache = {}
         logger.info("Text preprocessor initialized")
 
+    def _get_cleaners(self):
+        """Deletion and keep patterns built once from the config.
+        
+        Digit and punctuation removal are both character deletions, so they
+        share a single character-class substitution.
+        """
+        if self._cleaners is None:
+            deleted = ''
+            if self.config.remove_numbers:
+                deleted += r'\d'
+            if self.config.remove_punctuation:
+                # Keep special characters if specified
+                punct = string.punctuation
+                for char in self.config.keep_special_chars:
+                    punct = punct.replace(char, '')
+                deleted += re.escape(punct)
+            delete_pattern = re.compile(f'[{deleted}]+') if deleted else None
+            
+            keep = self.config.keep_special_chars
+            keep_search = re.compile('|'.join(map(re.escape, keep))).search if keep else None
+            self._cleaners = (delete_pattern, keep_search)
+        return self._cleaners
+
+    @property
+    def lemmatizer(self):
+        """WordNet lemmatizer.
+        
+        Raises:
+            LookupError: If WordNet is not in ``config.nltk_data_dir``
+        """
+        if self._lemmatizer is None:
+            _load_nltk(self.config.nltk_data_dir)
+            from nltk.stem import WordNetLemmatizer
+            lemmatizer = WordNetLemmatizer()
+            try:
+                # WordNet itself loads on the first lookup
+                lemmatizer.lemmatize('cats')
+            except LookupError:
+                raise _missing_nltk_resource('wordnet', self.config.nltk_data_dir)
+            self._lemmatizer = lemmatizer
+        return self._lemmatizer
+
+    @property
+    def stopwords(self) -> set:
+        """English plus custom stopwords.
+        
+        Raises:
+            LookupError: If the stopwords corpus is not in ``config.nltk_data_dir``
+        """
+        if self._stopwords is None:
+            _load_nltk(self.config.nltk_data_dir)
+            from nltk.corpus import stopwords
+            try:
+                words = set(stopwords.words('english'))
+            except LookupError:
+                raise _missing_nltk_resource('stopwords', self.config.nltk_data_dir)
+            words.update(self.config.custom_stopwords)
+            self._stopwords = words
+        return self._stopwords
+
+    @property
+    def word_tokenize(self):
+        """NLTK word tokenizer.
+        
+        Raises:
+            LookupError: If Punkt is not in ``config.nltk_data_dir``
+        """
+        if self._word_tokenize is None:
+            _load_nltk(self.config.nltk_data_dir)
+            from nltk.tokenize import word_tokenize
+            try:
+                word_tokenize("probe")
+            except LookupError:
+                raise _missing_nltk_resource('punkt_tab', self.config.nltk_data_dir)
+            self._word_tokenize = word_tokenize
+        return self._word_tokenize
+
+    def load_resources(self):
+        """Load the NLTK resources the config needs, for readiness checks.
+        
+        Raises:
+            LookupError: Naming the first resource that is missing
+        """
+        self.word_tokenize
+        if self.config.remove_stopwords:
+            self.stopwords
+        if self.config.lemmatize:
+            self.lemmatizer
+
     def clean_text(self, text: str) -> str:
         """Clean text by removing unwanted characters and patterns."""
         try:
+            delete_pattern, _ = self._get_cleaners()
+            
             # Convert to lowercase if configured
             if self.config.lowercase:
                 text = text.lower()
             
-            # Remove URLs
-            text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-            
-            # Remove email addresses
-            text = re.sub(r'\S+@\S+', '', text)
+            # Remove URLs, then email addresses; the substring checks skip
+            # the backtracking regexes for the common text without either
+            if 'http' in text or 'www' in text:
+                text = URL_PATTERN.sub('', text)
+            if '@' in text:
+                text = EMAIL_PATTERN.sub('', text)
             
-            # Remove numbers if configured
-            if self.config.remove_numbers:
-                text = re.sub(r'\d+', '', text)
-            
-            # Remove punctuation if configured
-            if self.config.remove_punctuation:
-                # Keep special characters if specified
-                punct = string.punctuation
-                for char in self.config.keep_special_chars:
-                    punct = punct.replace(char, '')
-                text = text.translate(str.maketrans('', '', punct))
+            # Remove numbers and punctuation if configured
+            if delete_pattern is not None:
+                text = delete_pattern.sub('', text)
             
             # Remove extra whitespace
-            text = ' '.join(text.split())
-            
-            return text
+            return ' '.join(text.split())
             
         except Exception as e:
             logger.error(f"Error cleaning text: {str(e)}")
@@ -82,7 +227,9 @@ class TextPreprocessor:
     def tokenize(self, text: str) -> List[str]:
         """Tokenize text into words."""
         try:
-            return word_tokenize(text)
+            return self.word_tokenize(text)
+        except LookupError:
+            raise
         except Exception as e:
             logger.error(f"Error tokenizing text: {str(e)}")
             return text.split()
@@ -91,6 +238,8 @@ class TextPreprocessor:
         """Remove stopwords from token list."""
         try:
             return [token for token in tokens if token.lower() not in self.stopwords]
+        except LookupError:
+            raise
         except Exception as e:
             logger.error(f"Error removing stopwords: {str(e)}")
             return tokens
@@ -98,7 +247,22 @@ class TextPreprocessor:
     def lemmatize_text(self, tokens: List[str]) -> List[str]:
         """Lemmatize tokens."""
         try:
-            return [self.lemmatizer.lemmatize(token) for token in tokens]
+            lemmatizer = self.lemmatizer
+            
+            # Memoize per unique token; vocabularies repeat heavily
+            cache = self._lemma_cache
+            lemmas = []
+            for token in tokens:
+                lemma = cache.get(token)
+                if lemma is None:
+                    lemma = lemmatizer.lemmatize(token)
+                    if len(cache) >= self.config.lemma_cache_size:
+                        cache.clear()
+                    cache[token] = lemma
+                lemmas.append(lemma)
+            return lemmas
+        except LookupError:
+            raise
         except Exception as e:
             logger.error(f"Error lemmatizing text: {str(e)}")
             return tokens
@@ -106,26 +270,22 @@ class TextPreprocessor:
     def filter_tokens(self, tokens: List[str]) -> List[str]:
         """Filter tokens based on configuration."""
         try:
-            filtered = []
-            for token in tokens:
-                # Check minimum length
-                if len(token) < self.config.min_word_length:
-                    continue
-                    
-                # Keep special characters if they're in the token
-                if any(char in token for char in self.config.keep_special_chars):
-                    filtered.append(token)
-                    continue
-                    
-                # Remove tokens that are just punctuation or numbers
-                if self.config.remove_punctuation and all(char in string.punctuation for char in token):
-                    continue
-                if self.config.remove_numbers and token.isdigit():
-                    continue
-                    
-                filtered.append(token)
-                
-            return filtered
+            _, keep_search = self._get_cleaners()
+            min_length = self.config.min_word_length
+            remove_punctuation = self.config.remove_punctuation
+            remove_numbers = self.config.remove_numbers
+            punct = string.punctuation
+            
+            # Keep tokens containing special characters; otherwise drop tokens
+            # that are just punctuation or numbers
+            return [
+                token for token in tokens
+                if len(token) >= min_length and (
+                    (keep_search is not None and keep_search(token) is not None)
+                    or not ((remove_punctuation and not token.strip(punct))
+                            or (remove_numbers and token.isdigit()))
+                )
+            ]
             
         except Exception as e:
             logger.error(f"Error filtering tokens: {str(e)}")
@@ -158,8 +318,117 @@ class TextPreprocessor:
             logger.error(f"Error extracting features: {str(e)}")
             return {}
 
-    def preprocess(self, text: Union[str, List[str]], extract_features: bool = False) -> Dict:
-        """Process text through the complete pipeline."""
+    def _clean_text_reference(self, text: str) -> str:
+        """Multi-pass ``clean_text``, kept to check and benchmark the fused path."""
+        try:
+            # Convert to lowercase if configured
+            if self.config.lowercase:
+                text = text.lower()
+            
+            # Remove URLs
+            text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+            
+            # Remove email addresses
+            text = re.sub(r'\S+@\S+', '', text)
+            
+            # Remove numbers if configured
+            if self.config.remove_numbers:
+                text = re.sub(r'\d+', '', text)
+            
+            # Remove punctuation if configured
+            if self.config.remove_punctuation:
+                # Keep special characters if specified
+                punct = string.punctuation
+                for char in self.config.keep_special_chars:
+                    punct = punct.replace(char, '')
+                text = text.translate(str.maketrans('', '', punct))
+            
+            # Remove extra whitespace
+            text = ' '.join(text.split())
+            
+            return text
+            
+        except Exception as e:
+            logger.error(f"Error cleaning text: {str(e)}")
+            return text
+
+    def _filter_tokens_reference(self, tokens: List[str]) -> List[str]:
+        """Per-character ``filter_tokens``, kept to check and benchmark the fused path."""
+        try:
+            filtered = []
+            for token in tokens:
+                # Check minimum length
+                if len(token) < self.config.min_word_length:
+                    continue
+                    
+                # Keep special characters if they're in the token
+                if any(char in token for char in self.config.keep_special_chars):
+                    filtered.append(token)
+                    continue
+                    
+                # Remove tokens that are just punctuation or numbers
+                if self.config.remove_punctuation and all(char in string.punctuation for char in token):
+                    continue
+                if self.config.remove_numbers and token.isdigit():
+                    continue
+                    
+                filtered.append(token)
+                
+            return filtered
+            
+        except Exception as e:
+            logger.error(f"Error filtering tokens: {str(e)}")
+            return tokens
+
+    def benchmark_cleaning(self, texts: Optional[List[str]] = None,
+                           n_texts: int = 200000) -> Dict:
+        """Time the fused cleaner and token filter against the multi-pass ones.
+        
+        Args:
+            texts: Corpus to clean; a synthetic one is generated if omitted
+            n_texts: Size of the synthetic corpus
+            
+        Returns:
+            Seconds per path, speedups, and whether outputs are identical
+        """
+        texts = texts if texts is not None else _synthetic_corpus(n_texts)
+        token_lists = [text.split() for text in texts]
+        self._get_cleaners()
+        
+        start = time.perf_counter()
+        reference_cleaned = [self._clean_text_reference(text) for text in texts]
+        reference_clean_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        cleaned = [self.clean_text(text) for text in texts]
+        clean_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        reference_filtered = [self._filter_tokens_reference(tokens) for tokens in token_lists]
+        reference_filter_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        filtered = [self.filter_tokens(tokens) for tokens in token_lists]
+        filter_seconds = time.perf_counter() - start
+        
+        return {
+            'texts': len(texts),
+            'reference_clean_seconds': reference_clean_seconds,
+            'clean_seconds': clean_seconds,
+            'clean_speedup': reference_clean_seconds / clean_seconds,
+            'reference_filter_seconds': reference_filter_seconds,
+            'filter_seconds': filter_seconds,
+            'filter_speedup': reference_filter_seconds / filter_seconds,
+            'identical': cleaned == reference_cleaned and filtered == reference_filtered
+        }
+
+    def preprocess(self, text: Union[str, List[str]], extract_features: bool = False,
+                   pad: bool = True) -> Dict:
+        """Process text through the complete pipeline.
+        
+        With ``pad=False`` token sequences are neither padded nor truncated
+        to ``max_sequence_length``, for callers that handle long inputs.
+        """
         try:
             # Handle single text or list of texts
             if isinstance(text, str):
@@ -171,31 +440,9 @@ class TextPreprocessor:
             all_features = []
             
             for t in texts:
-                # Clean text
-                cleaned = self.clean_text(t)
-                
-                # Tokenize
-                tokens = self.tokenize(cleaned)
-                
-                # Remove stopwords if configured
-                if self.config.remove_stopwords:
-                    tokens = self.remove_stopwords(tokens)
-                
-                # Lemmatize if configured
-                if self.config.lemmatize:
-                    tokens = self.lemmatize_text(tokens)
-                
-                # Filter tokens
-                tokens = self.filter_tokens(tokens)
-                
-                # Pad sequence
-                tokens = self.pad_sequence(tokens)
-                
-                # Extract features if requested
+                tokens, features = self._preprocess_one(t, extract_features, pad)
                 if extract_features:
-                    features = self.extract_features(t)
                     all_features.append(features)
-                
                 processed_texts.append(tokens)
             
             result = {
@@ -212,7 +459,142 @@ class TextPreprocessor:
             logger.error(f"Error in preprocessing pipeline: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def _preprocess_one(self, text: str, extract_features: bool, pad: bool):
+        """Run one text through the pipeline; returns (tokens, features)."""
+        # Clean text
+        cleaned = self.clean_text(text)
+        
+        # Tokenize
+        tokens = self.tokenize(cleaned)
+        
+        # Remove stopwords if configured
+        if self.config.remove_stopwords:
+            tokens = self.remove_stopwords(tokens)
+        
+        # Lemmatize if configured
+        if self.config.lemmatize:
+            tokens = self.lemmatize_text(tokens)
+        
+        # Filter tokens
+        tokens = self.filter_tokens(tokens)
+        
+        # Pad sequence
+        if pad:
+            tokens = self.pad_sequence(tokens)
+        
+        # Extract features if requested
+        features = self.extract_features(text) if extract_features else None
+        return tokens, features
+
+    def preprocess_corpus(self, corpus: Union[str, Iterable[str]], workers: Optional[int] = None,
+                          chunk_size: int = 1000, extract_features: bool = False,
+                          pad: bool = True, text_field: str = 'text') -> Iterator[Dict]:
+        """Preprocess a large corpus across a process pool, streaming results.
+        
+        Texts are sent to workers in chunks to amortize IPC, at most two
+        chunks per worker are in flight, and results come back in input
+        order, so memory stays bounded for corpora of any size.
+        
+        Args:
+            corpus: Iterable of texts, or a path to a text file (one text
+                per line) or a JSONL file
+            workers: Worker processes; defaults to the CPU count, 1 runs
+                in-process
+            chunk_size: Texts per worker task
+            extract_features: Also compute text features
+            pad: Pad/truncate token sequences, as in ``preprocess``
+            text_field: Field holding the text in JSONL records
+            
+        Yields:
+            Dict with ``processed_text`` tokens and, if requested, ``features``
+        """
+        texts = _iter_corpus(corpus, text_field) if isinstance(corpus, str) else iter(corpus)
+        chunks = _chunks(texts, chunk_size)
+        workers = workers or os.cpu_count() or 1
+        
+        if workers == 1:
+            for chunk in chunks:
+                yield from _format_chunk(
+                    [self._preprocess_one(text, extract_features, pad) for text in chunk],
+                    extract_features
+                )
+            return
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_corpus_worker,
+            initargs=(self.config,)
+        ) as executor:
+            pending = deque()
+            try:
+                for chunk in chunks:
+                    pending.append(executor.submit(_preprocess_chunk, chunk, extract_features, pad))
+                    if len(pending) >= workers * 2:
+                        yield from _format_chunk(pending.popleft().result(), extract_features)
+                while pending:
+                    yield from _format_chunk(pending.popleft().result(), extract_features)
+            finally:
+                # Consumer stopped early or a worker failed
+                for future in pending:
+                    future.cancel()
+
+# Per-process preprocessor for preprocess_corpus workers
+_worker_preprocessor = None
+
+def _init_corpus_worker(config: PreprocessConfig):
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(config)
+
+def _preprocess_chunk(texts: List[str], extract_features: bool, pad: bool) -> List:
+    return [_worker_preprocessor._preprocess_one(text, extract_features, pad) for text in texts]
+
+def _format_chunk(results: List, extract_features: bool) -> Iterator[Dict]:
+    for tokens, features in results:
+        item = {'processed_text': tokens}
+        if extract_features:
+            item['features'] = features
+        yield item
+
+def _chunks(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _iter_corpus(path: str, text_field: str = 'text') -> Iterator[str]:
+    """Stream texts from a plain-text (one per line) or JSONL file."""
+    is_jsonl = path.endswith(('.jsonl', '.ndjson'))
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            yield json.loads(line)[text_field] if is_jsonl else line
+
 if __name__ == "__main__":
+    if '--download-nltk-data' in sys.argv:
+        download_nltk_data()
+        sys.exit(0)
+    
+    if '--benchmark' in sys.argv:
+        print(json.dumps(TextPreprocessor().benchmark_cleaning(), indent=2))
+        sys.exit(0)
+    
+    if '--cold-start' in sys.argv:
+        cold_start = measure_cold_start(
+            "from preprocess.textPreprocess import TextPreprocessor",
+            "TextPreprocessor()",
+            path=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        cold_start['budget_seconds'] = COLD_START_BUDGET_SECONDS
+        cold_start['within_budget'] = cold_start['total_seconds'] <= COLD_START_BUDGET_SECONDS
+        print(json.dumps(cold_start, indent=2))
+        sys.exit(0)
+    
     try:
         # Initialize preprocessor
         preprocessor = TextPreprocessor()
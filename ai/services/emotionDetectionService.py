@@ -6,12 +6,15 @@ import logging
 from dataclasses import dataclass
 from typing import List, Dict, Tuple, Optional, Union
 import os
+import time
 from datetime import datetime
 
 # Import local modules
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from preprocess.facePreprocess import FacePreprocessor, PreprocessConfig
+from preprocess.faceDataset import FaceDatasetBuilder, FaceDatasetConfig, split_paths
+from monitoring.tracing import record_model_call, span, traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -107,6 +110,24 @@ class EmotionDetectionService:
             logger.error(f"Error building model: {str(e)}")
             raise
 
+    def warmup(self) -> Dict:
+        """Run a blank frame through detection and a blank face through single and batch predict."""
+        try:
+            started = time.perf_counter()
+            height, width = self.config.input_shape[:2]
+            self.preprocessor.detect_faces(np.zeros((height, width, 3), dtype=np.uint8))
+            
+            face = np.zeros(self.config.input_shape, dtype=np.float32)
+            self.model.predict(np.expand_dims(face, axis=0), verbose=0)
+            self.model.predict(np.stack([face, face]), batch_size=self.config.batch_size, verbose=0)
+            
+            return {'success': True, 'seconds': time.perf_counter() - started}
+        
+        except Exception as e:
+            logger.error(f"Error warming up emotion detection: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    @traced('emotion.preprocess')
     def preprocess_face(self, face_image: np.ndarray) -> np.ndarray:
         """Preprocess face for emotion detection."""
         try:
@@ -128,6 +149,7 @@ class EmotionDetectionService:
             logger.error(f"Error preprocessing face: {str(e)}")
             return None
 
+    @traced('emotion.detect')
     def detect_emotion(self, face_image: np.ndarray) -> Dict:
         """Detect emotion in a face image."""
         try:
@@ -136,43 +158,68 @@ class EmotionDetectionService:
             if not result['success'] or not result['faces']:
                 return {'success': False, 'error': "No valid face detected"}
             
-            # Preprocess face
-            face = self.preprocess_face(result['faces'][0])
+            return self._predict_emotion(result['faces'][0])
+            
+        except Exception as e:
+            logger.error(f"Error detecting emotion: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    @traced('emotion.detect_aligned')
+    def detect_emotion_aligned(self, aligned_face: np.ndarray) -> Dict:
+        """Classify the emotion of an already detected and aligned face crop.
+        
+        Args:
+            aligned_face: Face crop as ``extract_face`` and ``align_face`` return it
+        """
+        try:
+            face = self.preprocessor.preprocess_face(aligned_face)
             if face is None:
                 return {'success': False, 'error': "Failed to preprocess face"}
             
-            # Add batch dimension
-            face = np.expand_dims(face, axis=0)
-            
-            # Predict emotion
-            predictions = self.model.predict(face)[0]
-            
-            # Get top emotions
-            top_indices = np.argsort(predictions)[::-1]
-            
-            emotions = []
-            for idx in top_indices:
-                emotion = {
-                    'emotion': self.config.emotions[idx],
-                    'confidence': float(predictions[idx])
-                }
-                emotions.append(emotion)
-            
-            # Get primary emotion
-            primary_emotion = emotions[0]
-            
-            return {
-                'success': True,
-                'primary_emotion': primary_emotion['emotion'],
-                'confidence': primary_emotion['confidence'],
-                'all_emotions': emotions,
-                'timestamp': datetime.now().isoformat()
-            }
-            
+            return self._predict_emotion(face)
+        
         except Exception as e:
             logger.error(f"Error detecting emotion: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def _predict_emotion(self, processed_face: np.ndarray) -> Dict:
+        """Classify a face already run through the preprocessor."""
+        # Preprocess face
+        face = self.preprocess_face(processed_face)
+        if face is None:
+            return {'success': False, 'error': "Failed to preprocess face"}
+        
+        # Add batch dimension
+        face = np.expand_dims(face, axis=0)
+        
+        # Predict emotion
+        with span('emotion.predict'):
+            predictions = self.model.predict(face)[0]
+        record_model_call('emotion')
+        
+        # Get top emotions
+        top_indices = np.argsort(predictions)[::-1]
+        
+        emotions = []
+        for idx in top_indices:
+            emotion = {
+                'emotion': self.config.emotions[idx],
+                'confidence': float(predictions[idx])
+            }
+            emotions.append(emotion)
+        
+        # Get primary emotion
+        primary_emotion = emotions[0]
+        
+        return {
+            'success': True,
+            'primary_emotion': primary_emotion['emotion'],
+            'confidence': primary_emotion['confidence'],
+            'all_emotions': emotions,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    @traced('emotion.detect_batch')
     def detect_emotions_batch(self, face_images: List[np.ndarray]) -> List[Dict]:
         """Detect emotions in a batch of face images."""
         try:
@@ -204,7 +251,9 @@ class EmotionDetectionService:
             batch_faces = np.array(batch_faces)
             
             # Predict emotions
-            predictions = self.model.predict(batch_faces, batch_size=self.config.batch_size)
+            with span('emotion.predict_batch'):
+                predictions = self.model.predict(batch_faces, batch_size=self.config.batch_size)
+            record_model_call('emotion', len(batch_faces))
             
             # Process predictions
             for pred in predictions:
@@ -271,6 +320,55 @@ class EmotionDetectionService:
             logger.error(f"Error training model: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def train_from_files(self, image_paths: List[str], labels: List[int],
+                         epochs: int = 50, validation_split: float = 0.2,
+                         dataset_config: Optional[FaceDatasetConfig] = None) -> Dict:
+        """Train from image files with a streaming tf.data pipeline.
+        
+        Args:
+            image_paths: Face image files
+            labels: Emotion class index per image
+            epochs: Training epochs
+            validation_split: Fraction of files held out for validation
+            dataset_config: Overrides for the input pipeline
+        """
+        try:
+            dataset_config = dataset_config or FaceDatasetConfig(
+                target_size=self.config.input_shape[:2],
+                grayscale=self.config.input_shape[2] == 1,
+                batch_size=self.config.batch_size
+            )
+            builder = FaceDatasetBuilder(dataset_config)
+            
+            (train_paths, train_labels), (val_paths, val_labels) = split_paths(
+                image_paths, labels, validation_split
+            )
+            train_dataset = builder.build(
+                train_paths, train_labels, training=True, num_classes=self.config.num_classes
+            )
+            val_dataset = builder.build(
+                val_paths, val_labels, training=False, num_classes=self.config.num_classes
+            ) if val_paths else None
+            
+            # Train model
+            history = self.model.fit(
+                train_dataset,
+                epochs=epochs,
+                validation_data=val_dataset
+            )
+            
+            # Save model
+            self.model.save_weights(self.config.model_path)
+            
+            return {
+                'success': True,
+                'history': history.history
+            }
+            
+        except Exception as e:
+            logger.error(f"Error training model from files: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
 if __name__ == "__main__":
     try:
         # Initialize service
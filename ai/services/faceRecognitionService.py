@@ -5,9 +5,14 @@ from tensorflow.keras import layers, models
 import mediapipe as mp
 import logging
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional, Union
+from typing import Iterator, List, Dict, Sequence, Tuple, Optional, Union
+import argparse
+import csv
+import hashlib
 import os
 import pickle
+import shutil
+import time
 from datetime import datetime
 import json
 
@@ -15,11 +20,15 @@ import json
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from preprocess.facePreprocess import FacePreprocessor, PreprocessConfig
+from preprocess.faceDataset import FaceDatasetBuilder, FaceDatasetConfig, encode_labels, split_paths
+from monitoring.tracing import record_model_call, span, traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
 @dataclass
 class FaceRecognitionConfig:
     """Configuration for face recognition service."""
@@ -30,6 +39,7 @@ class FaceRecognitionConfig:
     input_shape: Tuple[int, int, int] = (224, 224, 3)
     embedding_dim: int = 128
     max_faces_per_user: int = 5
+    duplicate_distance: float = 0.05  # bulk enrolment skips a user's faces closer than this
     min_detection_size: Tuple[int, int] = (30, 30)
     use_gpu: bool = True
 
@@ -99,6 +109,7 @@ class FaceRecognitionService:
             logger.error(f"Error building model: {str(e)}")
             raise
 
+    @traced('face_recognition.load_database')
     def _load_database(self) -> Dict:
         """Load face database from file."""
         try:
@@ -110,6 +121,7 @@ class FaceRecognitionService:
             logger.error(f"Error loading database: {str(e)}")
             return {}
 
+    @traced('face_recognition.save_database')
     def _save_database(self):
         """Save face database to file."""
         try:
@@ -119,6 +131,7 @@ class FaceRecognitionService:
         except Exception as e:
             logger.error(f"Error saving database: {str(e)}")
 
+    @traced('face_recognition.load_embeddings')
     def _load_embeddings(self) -> Dict:
         """Load face embeddings from file."""
         try:
@@ -130,6 +143,7 @@ class FaceRecognitionService:
             logger.error(f"Error loading embeddings: {str(e)}")
             return {}
 
+    @traced('face_recognition.save_embeddings')
     def _save_embeddings(self):
         """Save face embeddings to file."""
         try:
@@ -151,13 +165,49 @@ class FaceRecognitionService:
             face = np.expand_dims(face, axis=0)
             
             # Generate embedding
-            embedding = self.model.predict(face)[0]
+            with span('face_recognition.embed'):
+                embedding = self.model.predict(face)[0]
+            record_model_call('face_embedding')
             return embedding
             
         except Exception as e:
             logger.error(f"Error generating face embedding: {str(e)}")
             return None
 
+    def get_face_embeddings(self, face_images: Sequence[np.ndarray]) -> np.ndarray:
+        """Generate embeddings for a batch of aligned face crops.
+        
+        Crops go through the same transform as ``process_image`` followed
+        by ``get_face_embedding``, so embeddings match the per-image path.
+        """
+        faces = np.stack([
+            self.preprocessor.preprocess_face(self.preprocessor.preprocess_face(face))
+            for face in face_images
+        ])
+        with span('face_recognition.embed_batch'):
+            embeddings = np.asarray(self.model.predict_on_batch(faces))
+        record_model_call('face_embedding', len(faces))
+        return embeddings
+
+    def warmup(self) -> Dict:
+        """Run a blank frame through detection and a blank face through both embedding paths."""
+        try:
+            started = time.perf_counter()
+            height, width = self.config.input_shape[:2]
+            self.preprocessor.detect_faces(np.zeros((height, width, 3), dtype=np.uint8))
+            
+            face = np.zeros(self.config.input_shape, dtype=np.uint8)
+            if self.get_face_embedding(face) is None:
+                raise ValueError("Failed to generate face embedding")
+            self.get_face_embeddings([face, face])
+            
+            return {'success': True, 'seconds': time.perf_counter() - started}
+        
+        except Exception as e:
+            logger.error(f"Error warming up face recognition: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    @traced('face_recognition.register')
     def register_face(self, user_id: str, face_image: np.ndarray,
                      metadata: Dict = None) -> Dict:
         """Register a new face in the database."""
@@ -211,6 +261,218 @@ class FaceRecognitionService:
             logger.error(f"Error registering face: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    @traced('face_recognition.bulk_enroll')
+    def bulk_enroll(self, source: Union[str, Sequence[Tuple]], workers: Optional[int] = None,
+                    chunk_size: int = 5000, batch_size: int = 256,
+                    checkpoint_dir: Optional[str] = None, resume: bool = True,
+                    dataset_config: Optional[FaceDatasetConfig] = None) -> Dict:
+        """Register many faces offline and write the gallery once.
+        
+        Images are hashed, then detected and aligned in a process pool, then
+        embedded in large batches, one chunk at a time. Each finished chunk
+        is checkpointed, so an interrupted run resumes at the next chunk.
+        The enrolment rules are applied in manifest order at the end:
+        unreadable images, images without a face, files already enrolled or
+        listed twice, faces within ``duplicate_distance`` of one the user
+        already has, and faces beyond ``max_faces_per_user`` are skipped.
+        
+        Args:
+            source: Directory of per-user image folders, a .csv/.jsonl
+                manifest, or a sequence of ``(user_id, image_path[, metadata])``
+            workers: Detection processes, defaults to the CPU count
+            chunk_size: Images per checkpointed chunk
+            batch_size: Crops per embedding batch
+            checkpoint_dir: Checkpoint directory, next to the database by default
+            resume: Reuse finished chunks from a previous run of the same manifest
+            dataset_config: Crop cache settings
+        
+        Returns:
+            Enrolment counts, skip reasons and per-stage throughput
+        """
+        try:
+            if isinstance(source, str):
+                items = list(iter_enrolment_manifest(source))
+            else:
+                items = [(str(item[0]), item[1], dict(item[2]) if len(item) > 2 else {}) for item in source]
+            if not items:
+                return {'success': False, 'error': "No images to enroll"}
+            
+            stages = {stage: {'seconds': 0.0, 'items': 0} for stage in ('hash', 'detect', 'embed', 'write')}
+            builder = FaceDatasetBuilder(dataset_config or FaceDatasetConfig(
+                target_size=self.config.input_shape[:2],
+                workers=workers
+            ), self.preprocessor.config)
+            
+            # Start over unless the checkpoint belongs to this manifest
+            checkpoint_dir = checkpoint_dir or os.path.join(
+                os.path.dirname(self.config.database_path) or '.', 'enrolment_checkpoint'
+            )
+            fingerprint = hashlib.sha1('\n'.join(
+                f"{user_id}|{path}" for user_id, path, _ in items
+            ).encode('utf-8')).hexdigest()
+            state = {'fingerprint': fingerprint, 'chunk_size': chunk_size, 'total': len(items)}
+            state_path = os.path.join(checkpoint_dir, 'state.json')
+            if not (resume and _read_json(state_path) == state):
+                shutil.rmtree(checkpoint_dir, ignore_errors=True)
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            _write_json(state_path, state)
+            
+            enrolled_hashes = {
+                face['metadata'].get('source_sha1')
+                for user in self.face_database.values() for face in user['faces']
+            }
+            seen = set(enrolled_hashes)
+            chunks = []
+            
+            for index, start in enumerate(range(0, len(items), chunk_size)):
+                chunk_path = os.path.join(checkpoint_dir, f"chunk-{index:05d}.npz")
+                if os.path.exists(chunk_path):
+                    with np.load(chunk_path) as record:
+                        chunk = {name: record[name] for name in record.files}
+                    seen.update(chunk['hashes'])
+                    chunks.append(chunk)
+                    continue
+                
+                chunk_items = items[start:start + chunk_size]
+                
+                # Hash files so repeated images skip detection
+                started = time.perf_counter()
+                hashes = [_file_sha1(path) for _, path, _ in chunk_items]
+                status = []
+                for file_hash in hashes:
+                    if file_hash is None:
+                        status.append('unreadable')
+                    elif file_hash in enrolled_hashes:
+                        status.append('already_enrolled')
+                    elif file_hash in seen:
+                        status.append('duplicate')
+                    else:
+                        seen.add(file_hash)
+                        status.append('pending')
+                _add_stage(stages['hash'], started, len(chunk_items))
+                
+                # Detect and align in the process pool
+                started = time.perf_counter()
+                pending = [i for i, value in enumerate(status) if value == 'pending']
+                crops = builder.cache_crops([chunk_items[i][1] for i in pending])
+                for i, crop in zip(pending, crops):
+                    if crop is None:
+                        status[i] = 'no_face'
+                found = [(i, crop) for i, crop in zip(pending, crops) if crop is not None]
+                _add_stage(stages['detect'], started, len(pending))
+                
+                # Embed in large batches
+                started = time.perf_counter()
+                embeddings = [
+                    self.get_face_embeddings([np.load(crop) for _, crop in found[i:i + batch_size]])
+                    for i in range(0, len(found), batch_size)
+                ]
+                for i, _ in found:
+                    status[i] = 'embedded'
+                _add_stage(stages['embed'], started, len(found))
+                
+                chunk = {
+                    'start': np.asarray(start, dtype=np.int64),
+                    'positions': np.asarray([start + i for i, _ in found], dtype=np.int64),
+                    'embeddings': np.concatenate(embeddings).astype(np.float32) if embeddings
+                    else np.zeros((0, self.config.embedding_dim), dtype=np.float32),
+                    'status': np.asarray(status),
+                    'hashes': np.asarray([file_hash or '' for file_hash in hashes])
+                }
+                tmp_path = chunk_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, **chunk)
+                os.replace(tmp_path, chunk_path)
+                chunks.append(chunk)
+                logger.info(f"Enrolment chunk {index + 1}: {start + len(chunk_items)}/{len(items)} images processed")
+            
+            # Apply enrolment rules in manifest order and write once
+            started = time.perf_counter()
+            summary = self._merge_enrolment(items, chunks, enrolled_hashes)
+            self._save_database()
+            self._save_embeddings()
+            _add_stage(stages['write'], started, summary['enrolled'])
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+            
+            for stage in stages.values():
+                stage['items_per_second'] = stage['items'] / stage['seconds'] if stage['seconds'] else 0.0
+            throughput = ', '.join(f"{name} {stage['items_per_second']:.1f}/s" for name, stage in stages.items())
+            logger.info(f"Bulk enrolment finished: {summary['enrolled']}/{len(items)} faces enrolled ({throughput})")
+            
+            return {
+                'success': True,
+                'total': len(items),
+                **summary,
+                'stages': stages
+            }
+        
+        except Exception as e:
+            logger.error(f"Error in bulk enrolment: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _merge_enrolment(self, items: List[Tuple], chunks: List[Dict], enrolled_hashes: set) -> Dict:
+        """Add embedded faces to the in-memory gallery, enforcing the per-user rules."""
+        stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        skipped = {}
+        rejected = []
+        users = set()
+        enrolled = 0
+        
+        # Embeddings already on file per user, for near-duplicate checks
+        user_embeddings = {
+            user_id: [self.face_embeddings[face['face_id']] for face in user['faces']
+                      if face['face_id'] in self.face_embeddings]
+            for user_id, user in self.face_database.items()
+        }
+        
+        for chunk in chunks:
+            embeddings = dict(zip(chunk['positions'].tolist(), chunk['embeddings']))
+            start = int(chunk['start'])
+            for offset, (status, file_hash) in enumerate(zip(chunk['status'].tolist(), chunk['hashes'].tolist())):
+                position = start + offset
+                user_id, path, metadata = items[position]
+                
+                if status == 'embedded':
+                    embedding = embeddings[position]
+                    known = user_embeddings.setdefault(user_id, [])
+                    if file_hash in enrolled_hashes:
+                        # Written by an earlier run that stopped before cleanup
+                        status = 'already_enrolled'
+                    elif len(known) >= self.config.max_faces_per_user:
+                        status = 'limit'
+                    elif known and min(np.linalg.norm(embedding - other) for other in known) < self.config.duplicate_distance:
+                        status = 'near_duplicate'
+                
+                if status != 'embedded':
+                    skipped[status] = skipped.get(status, 0) + 1
+                    rejected.append({'user_id': user_id, 'image': path, 'reason': status})
+                    continue
+                
+                face_id = f"{user_id}_{stamp}_{position:06d}"
+                if user_id not in self.face_database:
+                    self.face_database[user_id] = {
+                        'user_id': user_id,
+                        'faces': []
+                    }
+                self.face_database[user_id]['faces'].append({
+                    'face_id': face_id,
+                    'timestamp': datetime.now().isoformat(),
+                    'metadata': {**metadata, 'source': path, 'source_sha1': file_hash}
+                })
+                self.face_embeddings[face_id] = embedding
+                known.append(embedding)
+                enrolled_hashes.add(file_hash)
+                users.add(user_id)
+                enrolled += 1
+        
+        return {
+            'enrolled': enrolled,
+            'users': len(users),
+            'skipped': skipped,
+            'rejected': rejected
+        }
+
+    @traced('face_recognition.recognize')
     def recognize_face(self, face_image: np.ndarray) -> Dict:
         """Recognize a face from the database."""
         try:
@@ -219,46 +481,69 @@ class FaceRecognitionService:
             if not result['success'] or not result['faces']:
                 return {'success': False, 'error': "No valid face detected"}
             
-            # Generate embedding
-            embedding = self.get_face_embedding(result['faces'][0])
-            if embedding is None:
-                return {'success': False, 'error': "Failed to generate face embedding"}
+            return self._match_face(result['faces'][0])
             
-            # Find closest match
-            best_match = None
-            best_distance = float('inf')
+        except Exception as e:
+            logger.error(f"Error recognizing face: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    @traced('face_recognition.recognize_aligned')
+    def recognize_aligned_face(self, aligned_face: np.ndarray) -> Dict:
+        """Match an already detected and aligned face crop against the gallery.
+        
+        Args:
+            aligned_face: Face crop as ``extract_face`` and ``align_face`` return it
+        """
+        try:
+            face = self.preprocessor.preprocess_face(aligned_face)
+            if face is None:
+                return {'success': False, 'error': "Failed to preprocess face"}
             
+            return self._match_face(face)
+        
+        except Exception as e:
+            logger.error(f"Error recognizing face: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _match_face(self, face: np.ndarray) -> Dict:
+        """Embed a preprocessed face and look up the closest enrolled face."""
+        # Generate embedding
+        embedding = self.get_face_embedding(face)
+        if embedding is None:
+            return {'success': False, 'error': "Failed to generate face embedding"}
+        
+        # Find closest match
+        best_match = None
+        best_distance = float('inf')
+        
+        with span('face_recognition.match'):
             for face_id, stored_embedding in self.face_embeddings.items():
                 distance = np.linalg.norm(embedding - stored_embedding)
                 if distance < best_distance:
                     best_distance = distance
                     best_match = face_id
-            
-            # Check confidence threshold
-            confidence = 1 / (1 + best_distance)
-            if confidence < self.config.confidence_threshold:
-                return {
-                    'success': True,
-                    'recognized': False,
-                    'confidence': confidence
-                }
-            
-            # Get user information
-            user_id = best_match.split('_')[0]
-            user_data = self.face_database[user_id]
-            
+        
+        # Check confidence threshold
+        confidence = float(1 / (1 + best_distance))
+        if confidence < self.config.confidence_threshold:
             return {
                 'success': True,
-                'recognized': True,
-                'user_id': user_id,
-                'face_id': best_match,
-                'confidence': confidence,
-                'user_data': user_data
+                'recognized': False,
+                'confidence': confidence
             }
-            
-        except Exception as e:
-            logger.error(f"Error recognizing face: {str(e)}")
-            return {'success': False, 'error': str(e)}
+        
+        # Get user information
+        user_id = best_match.split('_')[0]
+        user_data = self.face_database[user_id]
+        
+        return {
+            'success': True,
+            'recognized': True,
+            'user_id': user_id,
+            'face_id': best_match,
+            'confidence': confidence,
+            'user_data': user_data
+        }
 
     def update_face(self, user_id: str, face_id: str,
                    metadata: Dict = None) -> Dict:
@@ -352,7 +637,140 @@ class FaceRecognitionService:
             logger.error(f"Error training model: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def train_from_files(self, image_paths: List[str], user_ids: List[str],
+                         epochs: int = 10, batch_size: int = 32,
+                         validation_split: float = 0.2,
+                         dataset_config: Optional[FaceDatasetConfig] = None) -> Dict:
+        """Train from image files with a streaming tf.data pipeline.
+        
+        Crops are detected, aligned and cached in parallel, then streamed
+        from disk with on-the-fly augmentation, so the training set does
+        not need to fit in memory.
+        """
+        try:
+            dataset_config = dataset_config or FaceDatasetConfig(
+                target_size=self.config.input_shape[:2],
+                batch_size=batch_size
+            )
+            builder = FaceDatasetBuilder(dataset_config, self.preprocessor.config)
+            
+            # Map user ids to class indices
+            labels, classes = encode_labels(user_ids)
+            (train_paths, train_labels), (val_paths, val_labels) = split_paths(
+                image_paths, labels, validation_split
+            )
+            
+            train_dataset = builder.build(train_paths, train_labels, training=True)
+            val_dataset = builder.build(val_paths, val_labels, training=False) if val_paths else None
+            
+            # Train model
+            history = self.model.fit(
+                train_dataset,
+                epochs=epochs,
+                validation_data=val_dataset
+            )
+            
+            # Save model
+            self.model.save_weights(self.config.model_path)
+            
+            return {
+                'success': True,
+                'history': history.history,
+                'classes': classes
+            }
+            
+        except Exception as e:
+            logger.error(f"Error training model from files: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+def iter_enrolment_manifest(source: str, user_field: str = 'user_id',
+                            image_field: str = 'image') -> Iterator[Tuple[str, str, Dict]]:
+    """Read ``(user_id, image_path, metadata)`` from a directory or manifest.
+    
+    A directory holds one sub-directory of images per user. A .csv or
+    .jsonl manifest has one row per image; relative image paths resolve
+    against the manifest's directory and other columns become metadata.
+    """
+    if os.path.isdir(source):
+        for user_id in sorted(os.listdir(source)):
+            user_dir = os.path.join(source, user_id)
+            if not os.path.isdir(user_dir):
+                continue
+            for name in sorted(os.listdir(user_dir)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield user_id, os.path.join(user_dir, name), {}
+        return
+    
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8', newline='') as f:
+        if source.endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            row = dict(row)
+            user_id = str(row.pop(user_field))
+            image_path = os.path.join(base_dir, row.pop(image_field))
+            yield user_id, image_path, row
+
+def _file_sha1(path: str) -> Optional[str]:
+    """Content hash of a file, None if it cannot be read."""
+    try:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+def _add_stage(stage: Dict, started: float, items: int):
+    stage['seconds'] += time.perf_counter() - started
+    stage['items'] += items
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path: str, data: Dict):
+    """Write a JSON file atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def main_enroll(argv: List[str]) -> int:
+    """CLI: ``python faceRecognitionService.py enroll SOURCE [options]``."""
+    parser = argparse.ArgumentParser(description="Bulk enrol faces from a directory or manifest")
+    parser.add_argument('source', help="Directory of per-user folders, or a .csv/.jsonl manifest")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--checkpoint-dir', default=None)
+    parser.add_argument('--no-resume', action='store_true', help="Restart instead of resuming")
+    args = parser.parse_args(argv)
+    
+    result = FaceRecognitionService().bulk_enroll(
+        args.source,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=not args.no_resume
+    )
+    if result['success']:
+        # Counts per reason are in 'skipped'; only show the first rejections
+        result['rejected'] = result['rejected'][:100]
+    print(json.dumps(result, indent=2))
+    return 0 if result['success'] else 1
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'enroll':
+        sys.exit(main_enroll(sys.argv[2:]))
+    
     try:
         # Initialize service
         service = FaceRecognitionService()